@@ -8,9 +8,11 @@ import queryset
 from queryset import *
 import signals
 from signals import *
+import sessions
+from sessions import *
 
 __all__ = (document.__all__ + fields.__all__ + connection.__all__ +
-           queryset.__all__ + signals.__all__)
+           queryset.__all__ + signals.__all__ + sessions.__all__)
 
 VERSION = (0, 6, 18)
 
@@ -11,7 +11,6 @@ import sys
 from bson import ObjectId
 import operator
 
-from functools import partial
 from bson.dbref import DBRef
 
 
@@ -117,6 +116,20 @@ def get_document(name):
     return doc
 
 
+# How _from_son sets and defaults a field: straight into _data (plain),
+# wrapped in a BaseList / BaseDict (complex) or through the field's own
+# descriptor (custom)
+_PLAIN_DESCRIPTOR = 'plain'
+_COMPLEX_DESCRIPTOR = 'complex'
+_CUSTOM_DESCRIPTOR = 'custom'
+
+
+def _method_func(cls, name):
+    """Returns the function implementing method `name` on `cls`."""
+    method = getattr(cls, name, None)
+    return getattr(method, 'im_func', method)
+
+
 class BaseField(object):
     """A base class for fields in a MongoDB document. Instances of this class
     may be added to subclasses of `Document` to define a document's schema.
@@ -128,6 +141,10 @@ class BaseField(object):
 
     _geo_index = False
 
+    # The choices the cached choice keys were built from
+    _choices_compiled = None
+    _choice_keys = None
+
     # These track each time a Field instance is created. Used to retain order.
     # The auto_creation_counter is used for fields that MongoEngine implicitly
     # creates, creation_counter is used for all user-specified fields.
@@ -166,6 +183,10 @@ class BaseField(object):
             # Document class being used rather than a document object
             return self
 
+        # Convert the raw value first if the document was loaded lazily
+        if self.name in instance._lazy_fields:
+            instance._decode_lazy_field(self.name)
+
         # Get value from document instance if available, if not use default
         value = instance._data.get(self.name)
 
@@ -180,6 +201,8 @@ class BaseField(object):
     def __set__(self, instance, value):
         """Descriptor for assigning a value to a field in a document.
         """
+        if self.name in instance._lazy_fields:
+            instance._lazy_fields.discard(self.name)
         instance._data[self.name] = value
         instance._mark_as_changed(self.name)
 
@@ -213,12 +236,16 @@ class BaseField(object):
 
         # check choices
         if self.choices:
-            if isinstance(self.choices[0], (list, tuple)):
-                option_keys = [option_key for option_key, option_value in self.choices]
-                if value not in option_keys:
+            option_keys, option_set = self._get_choice_keys()
+            try:
+                valid = value in option_set
+            except TypeError:
+                # Unhashable values can't be looked up in the set
+                valid = value in option_keys
+            if not valid:
+                if isinstance(self.choices[0], (list, tuple)):
                     self.error('Value must be one of %s' % unicode(option_keys))
-            else:
-                if value not in self.choices:
+                else:
                     self.error('Value must be one of %s' % unicode(self.choices))
 
         # check validation argument
@@ -232,6 +259,23 @@ class BaseField(object):
 
         self.validate(value)
 
+    def _get_choice_keys(self):
+        """Returns the keys of the choices as a list and as a set for
+        checking values, built again only if :attr:`choices` is replaced.
+        """
+        if self._choices_compiled is not self.choices:
+            if isinstance(self.choices[0], (list, tuple)):
+                option_keys = [option_key for option_key, option_value in self.choices]
+            else:
+                option_keys = list(self.choices)
+            try:
+                option_set = frozenset(option_keys)
+            except TypeError:
+                option_set = option_keys
+            self._choice_keys = (option_keys, option_set)
+            self._choices_compiled = self.choices
+        return self._choice_keys
+
 
 class ComplexBaseField(BaseField):
     """Handles complex fields, such as lists / dictionaries.
@@ -268,6 +312,8 @@ class ComplexBaseField(BaseField):
     def __set__(self, instance, value):
         """Descriptor for assigning a value to a field in a document.
         """
+        if self.name in instance._lazy_fields:
+            instance._lazy_fields.discard(self.name)
         instance._data[self.name] = value
         instance._mark_as_changed(self.name)
 
@@ -406,6 +452,55 @@ class ComplexBaseField(BaseField):
     owner_document = property(_get_owner_document, _set_owner_document)
 
 
+# Setters that only store the value in the document's _data
+_PLAIN_SETTERS = (_method_func(BaseField, '__set__'),
+                  _method_func(ComplexBaseField, '__set__'))
+
+# Converters of fields whose values are stored as they are
+_IDENTITY_TO_PYTHON = _method_func(BaseField, 'to_python')
+_IDENTITY_TO_MONGO = _method_func(BaseField, 'to_mongo')
+
+
+def _field_to_mongo(field):
+    """Returns the function converting a value of `field` for MongoDB, or
+    ``None`` if values are stored as they are.
+    """
+    field_cls = field.__class__
+    to_mongo = _method_func(field_cls, 'to_mongo')
+    if (to_mongo is _IDENTITY_TO_MONGO and
+        _method_func(field_cls, 'to_python') is _IDENTITY_TO_PYTHON):
+        return None
+
+    item_field = getattr(field, 'field', None)
+    if (to_mongo is not _method_func(ComplexBaseField, 'to_mongo') or
+        not isinstance(item_field, BaseField)):
+        return field.to_mongo
+
+    # Lists of a known field type are converted item by item, without
+    # ComplexBaseField.to_mongo's type checks and intermediate dict
+    item_to_mongo = _field_to_mongo(item_field)
+
+    def list_to_mongo(value):
+        if not isinstance(value, (list, tuple)):
+            return field.to_mongo(value)
+        if item_to_mongo is None:
+            return list(value)
+        return [item_to_mongo(item) for item in value]
+    return list_to_mongo
+
+
+def _may_hold_embedded(field):
+    """Returns whether the values of `field` may be, or hold, embedded
+    documents that need linking to the document they are stored in.
+    """
+    from fields import EmbeddedDocumentField, GenericEmbeddedDocumentField
+    embedded_fields = (EmbeddedDocumentField, GenericEmbeddedDocumentField,
+                       BaseDynamicField)
+    if isinstance(field, ComplexBaseField):
+        return field.field is None or isinstance(field.field, embedded_fields)
+    return isinstance(field, embedded_fields)
+
+
 class BaseDynamicField(BaseField):
     """Used by :class:`~mongoengine.DynamicDocument` to handle dynamic data"""
 
@@ -592,6 +687,11 @@ class DocumentMetaclass(type):
             if field.name and hasattr(Document, field.name) and EmbeddedDocument not in new_class.mro():
                 raise InvalidDocumentError("%s is a document method and not a valid field name" % field.name)
 
+            if field.choices:
+                # Add a way to get the display value for a field with choices
+                new_class.add_to_class('get_%s_display' % field.name,
+                                       _field_display_method(field))
+
         module = attrs.get('__module__')
 
         base_excs = tuple(base.DoesNotExist for base in bases
@@ -608,12 +708,38 @@ class DocumentMetaclass(type):
         global _document_registry
         _document_registry[doc_class_name] = new_class
 
+        new_class._compile_serializers()
         return new_class
 
     def add_to_class(self, name, value):
         setattr(self, name, value)
 
 
+def _field_display_method(field):
+    """Returns a ``get_<field>_display`` method for a field with choices.
+    """
+    def get_field_display(self):
+        value = getattr(self, field.name)
+        if field.choices and isinstance(field.choices[0], (list, tuple)):
+            return dict(field.choices).get(value, value)
+        return value
+    return get_field_display
+
+
+def _overrides_init(cls):
+    """Checks if a document class customises __init__ or __setattr__, in
+    which case instances can't be built without calling the constructor.
+    """
+    from document import Document, EmbeddedDocument
+    base_classes = (BaseDocument, Document, EmbeddedDocument)
+    for klass in cls.__mro__:
+        if klass in base_classes:
+            break
+        if '__init__' in klass.__dict__ or '__setattr__' in klass.__dict__:
+            return True
+    return False
+
+
 class TopLevelDocumentMetaclass(DocumentMetaclass):
     """Metaclass for top-level documents (i.e. documents that have their own
     collection in the database.
@@ -665,6 +791,11 @@ class TopLevelDocumentMetaclass(DocumentMetaclass):
                     abstract_base_indexes += base._meta.get('indexes', [])
                 else:
                     base_indexes += base._meta.get('indexes', [])
+                # Propagate serialization, write and validation options
+                for key in ('lazy_decode', 'compile_serializers', 'write_behind',
+                            'validate_changed_only'):
+                    if key in base._meta:
+                        base_meta[key] = base._meta[key]
                 # Propagate 'allow_inheritance'
                 if 'allow_inheritance' in base._meta:
                     base_meta['allow_inheritance'] = base._meta['allow_inheritance']
@@ -733,6 +864,14 @@ class TopLevelDocumentMetaclass(DocumentMetaclass):
             new_class._fields['id'] = ObjectIdField(db_field='_id')
             new_class.id = new_class._fields['id']
 
+            # The serializers need to include the new id field
+            new_class._compile_serializers()
+
+        # The bases' queries now have to match this class too
+        for base in new_class.__mro__[1:]:
+            if '_class_names' in base.__dict__:
+                del base._class_names
+
         return new_class
 
 class BaseDocument(object):
@@ -741,9 +880,15 @@ class BaseDocument(object):
     _created = True
     _dynamic_lock = True
     _initialised = False
+    _lazy_fields = frozenset()
+    _dirty_fields = frozenset()
+    _owner = None
+    _owner_field = None
 
     def __init__(self, **values):
-        signals.pre_init.send(self.__class__, document=self, values=values)
+        if signals.pre_init.receivers:
+            signals.pre_init.send(self.__class__, document=self,
+                                  values=values)
 
         self._data = {}
 
@@ -766,17 +911,17 @@ class BaseDocument(object):
             for key, value in values.items():
                 setattr(self, key, value)
 
-        # Set any get_fieldname_display methods
-        self.__set_field_display()
-
         if self._dynamic:
             self._dynamic_lock = False
             for key, value in dynamic_data.items():
                 setattr(self, key, value)
 
+        self._link_fields()
+
         # Flag initialised
         self._initialised = True
-        signals.post_init.send(self.__class__, document=self)
+        if signals.post_init.receivers:
+            signals.post_init.send(self.__class__, document=self)
 
     def __setattr__(self, name, value):
         # Handle dynamic data only if an initialised dynamic document
@@ -846,34 +991,146 @@ class BaseDocument(object):
 
         return value
 
-    def validate(self):
+    def validate(self, changed_only=False):
         """Ensure that all fields' values are valid and that required fields
         are present.
-        """
-        # Get a list of tuples of field names and their current values
-        fields = [(field, getattr(self, name))
-                  for name, field in self._fields.items()]
 
-        # Ensure that each field is matched to a valid value
+        :param changed_only: only validate the values at the paths changed
+            since the document was loaded or saved, and check that the
+            required fields are present
+
+        .. versionchanged:: 0.6.18 added `changed_only`
+        """
         errors = {}
-        for field, value in fields:
-            if value is not None:
-                try:
-                    field._validate(value)
-                except ValidationError, error:
-                    errors[field.name] = error.errors or error
-                except (ValueError, AttributeError, AssertionError), error:
-                    errors[field.name] = error
-            elif field.required:
-                errors[field.name] = ValidationError('Field is required',
-                                                     field_name=field.name)
+        if changed_only:
+            for path in self._get_changed_fields():
+                self._validate_path(path.split('.'), errors)
+            for name in self._required_field_names:
+                value = self._data.get(name)
+                if value is None:
+                    value = getattr(self, name)
+                if value is None and name not in errors:
+                    errors[name] = ValidationError('Field is required',
+                                                   field_name=name)
+        else:
+            # Get a list of tuples of field names and their current values
+            fields = [(field, getattr(self, name))
+                      for name, field in self._fields.items()]
+
+            # Ensure that each field is matched to a valid value
+            for field, value in fields:
+                if value is not None:
+                    try:
+                        field._validate(value)
+                    except ValidationError, error:
+                        errors[field.name] = error.errors or error
+                    except (ValueError, AttributeError, AssertionError), error:
+                        errors[field.name] = error
+                elif field.required:
+                    errors[field.name] = ValidationError('Field is required',
+                                                         field_name=field.name)
         if errors:
             raise ValidationError('Errors encountered validating document',
                                   errors=errors)
 
+    def _validate_path(self, parts, errors):
+        """Validates the value at the path of db field names `parts` with the
+        field holding it, following the path into embedded documents so that
+        only the changed value is validated.  Errors are added to `errors`
+        under the path of field names.
+        """
+        value = self
+        field = None
+        item = False
+        names = []
+        for part in parts:
+            if isinstance(value, BaseDocument):
+                field_name = value._db_field_names.get(part)
+                if field_name is not None:
+                    field = value._fields[field_name]
+                    value = getattr(value, field_name, None)
+                elif value._dynamic and part in value._dynamic_fields:
+                    field_name = part
+                    field = value._dynamic_fields[part]
+                    value = value._data.get(part)
+                else:
+                    return
+                item = False
+            elif isinstance(value, (list, tuple)) and part.isdigit():
+                index = int(part)
+                if index >= len(value):
+                    return
+                value = value[index]
+                field_name = part
+                item = True
+            elif isinstance(value, dict):
+                value = value.get(part)
+                field_name = part
+                item = True
+            else:
+                # A change inside a plain value, validate all of it
+                break
+            names.append(field_name)
+            if value is None:
+                break
+
+        if field is None:
+            return
+        name = '.'.join(names)
+        if value is None:
+            if field.required and not item:
+                errors[name] = ValidationError('Field is required',
+                                               field_name=name)
+            return
+        try:
+            if not item:
+                field._validate(value)
+            elif getattr(field, 'field', None) is not None:
+                # Validate a single item the way its list or dict field would
+                field.field.validate(value)
+        except ValidationError, error:
+            errors[name] = error.errors or error
+        except (ValueError, AttributeError, AssertionError), error:
+            errors[name] = error
+
     def to_mongo(self):
         """Return data dictionary ready for use with MongoDB.
         """
+        mongo_fields = self._get_mongo_fields()
+        if mongo_fields is None:
+            return self._to_mongo_descriptors()
+
+        if self._lazy_fields:
+            self._load_lazy_fields()
+
+        _data = self._data
+        data = {}
+        for field_name, name, db_field, get_kind, convert in mongo_fields:
+            # Stored values can be used as they are, defaults and custom
+            # descriptors still go through getattr
+            value = None
+            if get_kind is not _CUSTOM_DESCRIPTOR:
+                value = _data.get(name)
+            if value is None:
+                value = getattr(self, field_name, None)
+            if value is not None:
+                data[db_field] = convert(value) if convert else value
+        if self._son_class_name:
+            data['_cls'] = self._son_class_name
+        if '_id' in data and data['_id'] is None:
+            del data['_id']
+
+        if not self._dynamic:
+            return data
+
+        for name, field in self._dynamic_fields.items():
+            data[name] = field.to_mongo(self._data.get(name, None))
+        return data
+
+    def _to_mongo_descriptors(self):
+        """Return data dictionary ready for use with MongoDB, reading each
+        field through its descriptor.
+        """
         data = {}
         for field_name, field in self._fields.items():
             value = getattr(self, field_name, None)
@@ -900,21 +1157,109 @@ class BaseDocument(object):
         return cls._meta.get('collection', None)
 
     @classmethod
-    def _from_son(cls, son):
+    def _from_son(cls, son, lazy=None, init_signals=True):
         """Create an instance of a Document (subclass) from a PyMongo SON.
+
+        The instance is filled straight from the SON using the class's field
+        table (see :meth:`_compile_serializers`) rather than through
+        :meth:`__init__`.  The constructor is still used if a ``pre_init`` or
+        ``post_init`` receiver is connected, or if the class can't be built
+        directly.
+
+        :param lazy: keep the raw values and only convert each field the first
+            time it is accessed, defaults to the ``lazy_decode`` meta option
+        :param init_signals: if ``False`` the document is built directly from
+            the SON even when init receivers are connected, used when loading
+            a batch of documents with a ``post_bulk_load`` signal instead
         """
         # get the class name from the document, falling back to the given
         # class if unavailable
         class_name = son.get(u'_cls', cls._class_name)
-        data = dict((str(key), value) for key, value in son.items())
-
-        if '_cls' in data:
-            del data['_cls']
 
         # Return correct subclass for document type
         if class_name != cls._class_name:
             cls = get_document(class_name)
 
+        if lazy is None:
+            lazy = cls._meta.get('lazy_decode', False)
+
+        son_fields = cls._get_son_fields()
+        if son_fields is None or (init_signals and
+                                  (signals.pre_init.receivers or
+                                   signals.post_init.receivers)):
+            return cls._from_son_init(son)
+
+        obj = cls.__new__(cls)
+        data = {}
+        obj.__dict__['_data'] = data
+
+        changed_fields = []
+        lazy_fields = set()
+        matched = 1 if u'_cls' in son else 0
+        for (field_name, name, db_field, field,
+             set_kind, get_kind, deferrable) in son_fields:
+            if db_field in son:
+                matched += 1
+                value = son[db_field]
+                if value is None:
+                    data[field_name] = None
+                elif lazy and deferrable:
+                    data[name] = value
+                    lazy_fields.add(name)
+                elif set_kind is _PLAIN_DESCRIPTOR:
+                    data[name] = field.to_python(value)
+                else:
+                    field.__set__(obj, field.to_python(value))
+                continue
+
+            # Assign the default value as __init__ would
+            if get_kind is _CUSTOM_DESCRIPTOR:
+                value = getattr(obj, field_name, None)
+                setattr(obj, field_name, value)
+            else:
+                value = field.default
+                if callable(value):
+                    value = value()
+                if value is None:
+                    data[field_name] = None
+                else:
+                    if get_kind is _COMPLEX_DESCRIPTOR:
+                        if isinstance(value, (list, tuple)):
+                            value = BaseList(value, obj, name)
+                        elif isinstance(value, dict):
+                            value = BaseDict(value, obj, name)
+                    data[name] = value
+            if isinstance(value, BaseDocument) and field.default:
+                changed_fields.append(field_name)
+
+        # Anything that isn't a field is set as a plain attribute, the same
+        # way passing it to the constructor would
+        if u'_id' in son and '_id' not in cls._fields:
+            setattr(obj, '_id', son[u'_id'])
+        if len(son) > matched:
+            for key, value in son.iteritems():
+                if key not in cls._son_db_fields:
+                    setattr(obj, str(key), value)
+
+        if lazy_fields:
+            obj.__dict__['_lazy_fields'] = lazy_fields
+        if cls._link_field_names:
+            obj._link_fields()
+        obj.__dict__.update(_initialised=True,
+                            _changed_fields=ChangedFields(changed_fields),
+                            _created=False)
+        return obj
+
+    @classmethod
+    def _from_son_init(cls, son):
+        """Create an instance of a Document (subclass) from a PyMongo SON by
+        passing the converted values through the constructor.
+        """
+        data = dict((str(key), value) for key, value in son.items())
+
+        if '_cls' in data:
+            del data['_cls']
+
         changed_fields = []
         for field_name, field in cls._fields.items():
             if field.db_field in data:
@@ -931,25 +1276,212 @@ class BaseDocument(object):
                     changed_fields.append(field_name)
 
         obj = cls(**data)
-        obj._changed_fields = changed_fields
+        obj._changed_fields = ChangedFields(changed_fields)
         obj._created = False
         return obj
 
+    @classmethod
+    def _compile_serializers(cls):
+        """Builds the field tables :meth:`to_mongo` and :meth:`_from_son` use
+        instead of going through every field's descriptor.  Called by the
+        metaclass when the class is created.
+
+        :meth:`_from_son` gets a tuple of ``(field_name, name, db_field,
+        field, set_kind, get_kind, deferrable)`` entries, ``deferrable``
+        fields may be left raw when loading lazily.  :meth:`to_mongo` gets a
+        tuple of ``(field_name, name, db_field, get_kind, convert)`` entries,
+        ``convert`` is ``None`` for values stored as they are.
+
+        Both tables are ``None`` for dynamic documents or if the
+        ``compile_serializers`` meta option is ``False``, and the son table
+        also if the class overrides ``__init__`` or ``__setattr__``.
+
+        The names of the fields that may hold embedded documents are kept in
+        ``_link_field_names`` for :meth:`_link_fields`, and those of the
+        required fields in ``_required_field_names`` for :meth:`validate`.
+        """
+        son_fields = mongo_fields = None
+        if not cls._dynamic and cls._meta.get('compile_serializers', True):
+            son_fields = []
+            mongo_fields = []
+            for field_name, field in cls._fields.items():
+                field_cls = field.__class__
+                if _method_func(field_cls, '__set__') in _PLAIN_SETTERS:
+                    set_kind = _PLAIN_DESCRIPTOR
+                else:
+                    set_kind = _CUSTOM_DESCRIPTOR
+
+                getter = _method_func(field_cls, '__get__')
+                if set_kind is _CUSTOM_DESCRIPTOR:
+                    get_kind = _CUSTOM_DESCRIPTOR
+                elif getter is _method_func(BaseField, '__get__'):
+                    get_kind = _PLAIN_DESCRIPTOR
+                elif getter is _method_func(ComplexBaseField, '__get__'):
+                    get_kind = _COMPLEX_DESCRIPTOR
+                else:
+                    get_kind = _CUSTOM_DESCRIPTOR
+
+                # Only fields read through the base descriptors can be
+                # decoded on access, and only if there is anything to decode
+                to_python = _method_func(field_cls, 'to_python')
+                deferrable = bool(field.name and
+                                  get_kind is not _CUSTOM_DESCRIPTOR and
+                                  to_python is not _IDENTITY_TO_PYTHON)
+
+                son_fields.append((field_name, field.name, field.db_field,
+                                   field, set_kind, get_kind, deferrable))
+                mongo_fields.append((field_name, field.name, field.db_field,
+                                     get_kind, _field_to_mongo(field)))
+            son_fields = tuple(son_fields)
+            mongo_fields = tuple(mongo_fields)
+            if _overrides_init(cls):
+                son_fields = None
+
+        cls._son_fields = son_fields
+        cls._mongo_fields = mongo_fields
+        cls._son_db_fields = frozenset(
+            [f.db_field for f in cls._fields.values()] + ['_cls'])
+        cls._db_field_names = dict((field.db_field, field_name)
+                                   for field_name, field in cls._fields.items())
+        cls._link_field_names = tuple(
+            field_name for field_name, field in cls._fields.items()
+            if _may_hold_embedded(field))
+        cls._required_field_names = tuple(
+            field_name for field_name, field in cls._fields.items()
+            if field.required)
+        # Only add _cls if allow_inheritance is not False
+        if cls._meta.get('allow_inheritance', True) == False:
+            cls._son_class_name = None
+        else:
+            cls._son_class_name = cls._class_name
+
+    @classmethod
+    def _get_son_fields(cls):
+        """Returns the field table used by :meth:`_from_son`, or ``None`` if
+        instances have to be built through :meth:`__init__`.
+        """
+        if '_son_fields' not in cls.__dict__:
+            cls._compile_serializers()
+        return cls._son_fields
+
+    @classmethod
+    def _get_mongo_fields(cls):
+        """Returns the field table used by :meth:`to_mongo`, or ``None`` if
+        the values have to be read through the field descriptors.
+        """
+        if '_mongo_fields' not in cls.__dict__:
+            cls._compile_serializers()
+        return cls._mongo_fields
+
+    def _decode_lazy_field(self, name):
+        """Converts the raw value of a lazily loaded field to a Python type.
+        """
+        self._lazy_fields.discard(name)
+        value = self._data.get(name)
+        if value is not None:
+            self._data[name] = self._fields[name].to_python(value)
+            if name in self._link_field_names:
+                self._link_fields((name,))
+
+    def _load_lazy_fields(self):
+        """Converts the raw values of all fields that haven't been accessed
+        yet on a lazily loaded document.
+        """
+        for name in list(self._lazy_fields):
+            self._decode_lazy_field(name)
+
     def _mark_as_changed(self, key):
-        """Marks a key as explicitly changed by the user
+        """Marks a key as explicitly changed by the user, and flags the field
+        holding this document as dirty on the documents it is embedded in.
         """
         if not key:
             return
         key = self._db_field_map.get(key, key)
-        if hasattr(self, '_changed_fields') and key not in self._changed_fields:
-            self._changed_fields.append(key)
+        changed_fields = getattr(self, '_changed_fields', None)
+        if changed_fields is not None and key not in changed_fields:
+            if not isinstance(changed_fields, ChangedFields):
+                changed_fields = ChangedFields(changed_fields)
+                self.__dict__['_changed_fields'] = changed_fields
+            changed_fields.append(key)
+        if self._owner is not None:
+            self._owner._mark_dirty(self._owner_field)
+
+    def _mark_dirty(self, field_name):
+        """Flags field `field_name` as holding an embedded document with
+        changes, on this document and on the documents it is embedded in.
+        """
+        document = self
+        while document is not None:
+            dirty_fields = document.__dict__.get('_dirty_fields')
+            if dirty_fields is None:
+                dirty_fields = document.__dict__['_dirty_fields'] = set()
+            dirty_fields.add(field_name)
+            field_name = document._owner_field
+            document = document._owner
+
+    def _link_fields(self, field_names=None):
+        """Links the embedded documents held in `field_names` (by default every
+        field that may hold one) to this document, so that changes made to
+        them flag the field as dirty.  Returns the embedded documents found.
+        """
+        if field_names is None:
+            field_names = self._link_field_names
+            if self._dynamic:
+                field_names = field_names + tuple(self._dynamic_fields)
+
+        documents = []
+        data = self._data
+        lazy_fields = self._lazy_fields
+        for field_name in field_names:
+            if field_name in lazy_fields:
+                continue
+            value = data.get(field_name)
+            if isinstance(value, BaseDocument):
+                values = (value,)
+            elif isinstance(value, (list, tuple)):
+                values = value
+            elif isinstance(value, dict):
+                values = value.values()
+            else:
+                continue
+            for value in values:
+                if (isinstance(value, BaseDocument) and not
+                    isinstance(value.__class__, TopLevelDocumentMetaclass)):
+                    value.__dict__['_owner'] = self
+                    value.__dict__['_owner_field'] = field_name
+                    documents.append(value)
+        return documents
+
+    def _clear_changed_fields(self, everything=False):
+        """Forgets the changes made to the document once they are saved,
+        along with those of the embedded documents they were made in.  The
+        embedded documents visited are linked to the document again.
+
+        :param everything: visit every embedded document, not just the ones
+            with changes, as after the document has been inserted
+        """
+        if everything:
+            field_names = None
+        else:
+            field_names = set(self._dirty_fields)
+            reverse_map = self._reverse_db_field_map
+            field_names.update(reverse_map.get(key, key) for key in
+                               getattr(self, '_changed_fields', ()))
+        for document in self._link_fields(field_names):
+            document._clear_changed_fields(everything)
+        self.__dict__['_changed_fields'] = ChangedFields()
+        self.__dict__.pop('_dirty_fields', None)
 
     def _get_changed_fields(self, key='', inspected=None):
         """Returns a list of all fields that have explicitly been changed.
+        Only the fields flagged as dirty by an embedded document are looked
+        into, the rest of the document isn't walked.
         """
-        from mongoengine import EmbeddedDocument, DynamicEmbeddedDocument
         _changed_fields = []
         _changed_fields += getattr(self, '_changed_fields', [])
+        dirty_fields = self._dirty_fields
+        if not dirty_fields:
+            return _changed_fields
 
         inspected = inspected or set()
         if hasattr(self, 'id'):
@@ -957,12 +1489,16 @@ class BaseDocument(object):
                 return _changed_fields
             inspected.add(self.id)
 
-        field_list = self._fields.copy()
+        field_list = list(self._fields)
         if self._dynamic:
-            field_list.update(self._dynamic_fields)
+            field_list += list(self._dynamic_fields)
 
         for field_name in field_list:
+            if field_name not in dirty_fields:
+                continue
             db_field_name = self._db_field_map.get(field_name, field_name)
+            if db_field_name in _changed_fields:
+                continue
             key = '%s.' % db_field_name
             field = getattr(self, field_name, None)
             if hasattr(field, 'id'):
@@ -970,47 +1506,81 @@ class BaseDocument(object):
                     continue
                 inspected.add(field.id)
 
-            if isinstance(field, (EmbeddedDocument, DynamicEmbeddedDocument)) and db_field_name not in _changed_fields:  # Grab all embedded fields that have been changed
+            if isinstance(field, BaseDocument):  # Grab all embedded fields that have been changed
                 _changed_fields += ["%s%s" % (key, k) for k in field._get_changed_fields(key, inspected) if k]
-            elif isinstance(field, (list, tuple, dict)) and db_field_name not in _changed_fields:  # Loop list / dict fields as they contain documents
+            elif isinstance(field, (list, tuple, dict)):  # Loop list / dict fields as they contain documents
                 # Determine the iterator to use
                 if not hasattr(field, 'items'):
                     iterator = enumerate(field)
                 else:
                     iterator = field.iteritems()
                 for index, value in iterator:
-                    if not hasattr(value, '_get_changed_fields'):
+                    if not isinstance(value, BaseDocument) or not (
+                        value._dirty_fields or
+                        getattr(value, '_changed_fields', None)):
+                        continue
+                    if isinstance(value.__class__, TopLevelDocumentMetaclass):
                         continue
                     list_key = "%s%s." % (key, index)
                     _changed_fields += ["%s%s" % (list_key, k) for k in value._get_changed_fields(list_key, inspected) if k]
         return _changed_fields
 
+    def _get_mongo_value(self, parts):
+        """Returns the value at the path of db field names `parts`, converted
+        the same way :meth:`to_mongo` would but without converting the rest
+        of the document.
+        """
+        value = self
+        field = None
+        item = False
+        for part in parts:
+            if isinstance(value, BaseDocument):
+                field_name = value._db_field_names.get(part)
+                if field_name is not None:
+                    field = value._fields[field_name]
+                    value = getattr(value, field_name, None)
+                elif value._dynamic and part in value._dynamic_fields:
+                    field = value._dynamic_fields[part]
+                    value = value._data.get(part)
+                else:
+                    return None
+                item = False
+            elif isinstance(value, (list, tuple)) and part.isdigit():
+                index = int(part)
+                if index >= len(value):
+                    return None
+                value = value[index]
+                item = True
+            elif isinstance(value, dict):
+                value = value.get(part)
+                item = True
+            else:
+                return None
+            if value is None:
+                return None
+
+        if item:
+            # Convert a single item the way its list or dict field would
+            return field.to_mongo([value])[0]
+        return field.to_mongo(value)
+
     def _delta(self):
         """Returns the delta (set, unset) of the changes for a document.
         Gets any values that have been explicitly changed.
         """
-        # Handles cases where not loaded from_son but has _id
-        doc = self.to_mongo()
         set_fields = self._get_changed_fields()
         set_data = {}
         unset_data = {}
         parts = []
         if hasattr(self, '_changed_fields'):
             set_data = {}
-            # Fetch each set item from its path
+            # Convert only the value at each changed path
             for path in set_fields:
                 parts = path.split('.')
-                d = doc
-                for p in parts:
-                    if hasattr(d, '__getattr__'):
-                        d = getattr(p, d)
-                    elif p.isdigit():
-                        d = d[int(p)]
-                    else:
-                        d = d.get(p)
-                set_data[path] = d
+                set_data[path] = self._get_mongo_value(parts)
         else:
-            set_data = doc
+            # Handles cases where not loaded from_son but has _id
+            set_data = self.to_mongo()
             if '_id' in set_data:
                 del(set_data['_id'])
 
@@ -1076,27 +1646,10 @@ class BaseDocument(object):
         return geo_indices
 
     def __getstate__(self):
-        removals = ["get_%s_display" % k for k, v in self._fields.items() if v.choices]
-        for k in removals:
-            if hasattr(self, k):
-                delattr(self, k)
         return self.__dict__
 
     def __setstate__(self, __dict__):
         self.__dict__ = __dict__
-        self.__set_field_display()
-
-    def __set_field_display(self):
-        for attr_name, field in self._fields.items():
-            if field.choices:  # dynamically adds a way to get the display value for a field with choices
-                setattr(self, 'get_%s_display' % attr_name, partial(self.__get_field_display, field=field))
-
-    def __get_field_display(self, field):
-        """Returns the display value for a choice field"""
-        value = getattr(self, field.name)
-        if field.choices and isinstance(field.choices[0], (list, tuple)):
-            return dict(field.choices).get(value, value)
-        return value
 
     def __iter__(self):
         return iter(self._fields)
@@ -1278,6 +1831,67 @@ class BaseDict(dict):
         if hasattr(self._instance, '_mark_as_changed'):
             self._instance._mark_as_changed(self._name)
 
+
+class ChangedFields(list):
+    """The keys changed on a document, in the order they were changed.  A
+    set of the keys is kept alongside the list so that checking whether a
+    key has already been marked doesn't scan the list.
+    """
+
+    def __init__(self, keys=()):
+        super(ChangedFields, self).__init__()
+        self._keys = set()
+        self.extend(keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __setitem__(self, *args, **kwargs):
+        super(ChangedFields, self).__setitem__(*args, **kwargs)
+        self._keys = set(self)
+
+    def __delitem__(self, *args, **kwargs):
+        super(ChangedFields, self).__delitem__(*args, **kwargs)
+        self._keys = set(self)
+
+    def __setslice__(self, *args, **kwargs):
+        super(ChangedFields, self).__setslice__(*args, **kwargs)
+        self._keys = set(self)
+
+    def __delslice__(self, *args, **kwargs):
+        super(ChangedFields, self).__delslice__(*args, **kwargs)
+        self._keys = set(self)
+
+    def __iadd__(self, keys):
+        self.extend(keys)
+        return self
+
+    def append(self, key):
+        if key not in self._keys:
+            self._keys.add(key)
+            super(ChangedFields, self).append(key)
+
+    def extend(self, keys):
+        for key in keys:
+            self.append(key)
+
+    def insert(self, *args, **kwargs):
+        super(ChangedFields, self).insert(*args, **kwargs)
+        self._keys = set(self)
+
+    def pop(self, *args, **kwargs):
+        key = super(ChangedFields, self).pop(*args, **kwargs)
+        self._keys.discard(key)
+        return key
+
+    def remove(self, key):
+        super(ChangedFields, self).remove(key)
+        self._keys.discard(key)
+
+
 if sys.version_info < (2, 5):
     # Prior to Python 2.5, Exception was an old-style class
     import types
@@ -1,3 +1,7 @@
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
 import pymongo
 from pymongo import MongoClient, uri_parser
 from pymongo.read_preferences import ReadPreference
@@ -9,6 +13,7 @@ __all__ = ['ConnectionError', 'connect', 'register_connection',
 
 DEFAULT_CONNECTION_NAME = 'default'
 DEFAULT_DB_ALIAS = 'default'
+DEFAULT_DEREFERENCE_WORKERS = 1
 
 
 class ConnectionError(Exception):
@@ -20,11 +25,17 @@ _connections = {}
 _dbs = {}
 # Map of DB aliases to settings for the DB, including connection alias
 _db_settings = {}
+# Map of connection aliases to the thread pools fetching references, with
+# the id of the process that started them
+_dereference_pools = {}
+_dereference_pools_lock = threading.Lock()
 
 
 def register_connection(alias, host='localhost', port=27017,
                         is_slave=False, read_preference=ReadPreference.PRIMARY,
-                        slaves=None, username=None, password=None, **kwargs):
+                        slaves=None, username=None, password=None,
+                        dereference_workers=DEFAULT_DEREFERENCE_WORKERS,
+                        **kwargs):
     """Add a connection.
 
     :param alias: the name that will be used to refer to this connection
@@ -38,6 +49,9 @@ def register_connection(alias, host='localhost', port=27017,
         be a registered connection that has :attr:`is_slave` set to ``True``
     :param username: username to authenticate with
     :param password: password to authenticate with
+    :param dereference_workers: the number of threads fetching referenced
+        documents from this connection concurrently, the default ``1``
+        fetches them one collection at a time
     :param kwargs: allow ad-hoc parameters to be passed into the pymongo driver
 
     """
@@ -49,7 +63,8 @@ def register_connection(alias, host='localhost', port=27017,
         _connection_settings[alias] = {
             'host': host,
             'username': uri_dict.get('username'),
-            'password': uri_dict.get('password')
+            'password': uri_dict.get('password'),
+            'dereference_workers': dereference_workers
         }
         _connection_settings[alias].update(kwargs)
         return
@@ -61,7 +76,8 @@ def register_connection(alias, host='localhost', port=27017,
         'slaves': slaves or [],
         'username': username,
         'password': password,
-        'read_preference': read_preference
+        'read_preference': read_preference,
+        'dereference_workers': dereference_workers
     }
     _connection_settings[alias].update(kwargs)
 
@@ -76,6 +92,11 @@ def disconnect(alias=DEFAULT_CONNECTION_NAME):
         del _connections[alias]
     if alias in _dbs:
         del _dbs[alias]
+    with _dereference_pools_lock:
+        if alias in _dereference_pools:
+            pid, pool = _dereference_pools.pop(alias)
+            if pid == os.getpid():
+                pool.close()
 
 
 def get_connection(alias=DEFAULT_CONNECTION_NAME, reconnect=False):
@@ -91,6 +112,7 @@ def get_connection(alias=DEFAULT_CONNECTION_NAME, reconnect=False):
                 msg = 'You have not defined a default connection'
             raise ConnectionError(msg)
         conn_settings = _connection_settings[alias].copy()
+        conn_settings.pop('dereference_workers', None)
 
         if hasattr(pymongo, 'version_tuple'):  # Support for 2.1+
             conn_settings.pop('slaves', None)
@@ -144,6 +166,28 @@ def get_db(alias=DEFAULT_DB_ALIAS, reconnect=False, refresh=False):
     return _dbs[alias]
 
 
+def get_dereference_pool(alias=DEFAULT_DB_ALIAS):
+    """Returns the thread pool fetching referenced documents from the
+    connection of the database `alias`, or ``None`` if the connection's
+    :attr:`dereference_workers` is less than two.  A forked process starts
+    its own pool, the threads of its parent's pool don't exist in it.
+    """
+    connection_alias = _db_settings[alias]['connection_alias']
+    if connection_alias not in _connection_settings:
+        return None
+    workers = _connection_settings[connection_alias].get(
+        'dereference_workers', DEFAULT_DEREFERENCE_WORKERS)
+    if not workers or workers < 2:
+        return None
+
+    with _dereference_pools_lock:
+        pid, pool = _dereference_pools.get(connection_alias, (None, None))
+        if pid != os.getpid():
+            pool = ThreadPool(workers)
+            _dereference_pools[connection_alias] = (os.getpid(), pool)
+        return pool
+
+
 def connect(alias=DEFAULT_CONNECTION_NAME, **kwargs):
     """
     Connect to a server.
@@ -1,12 +1,22 @@
+import threading
+
 from bson import DBRef, SON
 
 from base import (BaseDict, BaseList, TopLevelDocumentMetaclass, get_document)
 from fields import (ReferenceField, ListField, DictField, MapField)
-from connection import get_db
-from queryset import QuerySet
+from connection import get_db, get_dereference_pool, DEFAULT_DB_ALIAS
+from queryset import QuerySet, InvalidQueryError
 from document import Document
 
 
+# The largest number of ids looked up by one query
+FETCH_CHUNK_SIZE = 1000
+
+# Marks the pool threads, references loaded while fetching are fetched
+# inline so that a full pool never waits on itself
+_local = threading.local()
+
+
 class DeReference(object):
 
     def __call__(self, items, max_depth=1, instance=None, name=None):
@@ -66,55 +76,101 @@ class DeReference(object):
         depth += 1
         for k, item in iterator:
             if hasattr(item, '_fields'):
+                item._load_lazy_fields()
                 for field_name, field in item._fields.iteritems():
                     v = item._data.get(field_name, None)
                     if isinstance(v, (DBRef)):
-                        reference_map.setdefault(field.document_type, []).append(v.id)
+                        reference_map.setdefault(field.document_type, set()).add(v.id)
                     elif isinstance(v, (dict, SON)) and '_ref' in v:
-                        reference_map.setdefault(get_document(v['_cls']), []).append(v['_ref'].id)
+                        reference_map.setdefault(get_document(v['_cls']), set()).add(v['_ref'].id)
                     elif isinstance(v, (dict, list, tuple)) and depth <= self.max_depth:
                         field_cls = getattr(getattr(field, 'field', None), 'document_type', None)
                         references = self._find_references(v, depth)
                         for key, refs in references.iteritems():
                             if isinstance(field_cls, (Document, TopLevelDocumentMetaclass)):
                                 key = field_cls
-                            reference_map.setdefault(key, []).extend(refs)
+                            reference_map.setdefault(key, set()).update(refs)
             elif isinstance(item, (DBRef)):
-                reference_map.setdefault(item.collection, []).append(item.id)
+                reference_map.setdefault(item.collection, set()).add(item.id)
             elif isinstance(item, (dict, SON)) and '_ref' in item:
-                reference_map.setdefault(get_document(item['_cls']), []).append(item['_ref'].id)
+                reference_map.setdefault(get_document(item['_cls']), set()).add(item['_ref'].id)
             elif isinstance(item, (dict, list, tuple)) and depth - 1 <= self.max_depth:
                 references = self._find_references(item, depth - 1)
                 for key, refs in references.iteritems():
-                    reference_map.setdefault(key, []).extend(refs)
+                    reference_map.setdefault(key, set()).update(refs)
 
         return reference_map
 
     def _fetch_objects(self, doc_type=None):
-        """Fetch all references and convert to their document objects
+        """Fetch all references and convert to their document objects.  The
+        collections, and chunks of large sets of ids, are queried
+        concurrently on the dereference pools of their connections.
+        """
+        fetches = []
+        for col, ids in self.reference_map.iteritems():
+            ids = list(ids)
+            for i in xrange(0, len(ids), FETCH_CHUNK_SIZE):
+                fetches.append((col, ids[i:i + FETCH_CHUNK_SIZE]))
+
+        inline = []
+        pending = []
+        for col, ids in fetches:
+            pool = None
+            if len(fetches) > 1 and not getattr(_local, 'in_pool', False):
+                pool = get_dereference_pool(self._get_db_alias(col, doc_type))
+            if pool is None:
+                inline.append((col, ids))
+            else:
+                pending.append(pool.apply_async(self._fetch_in_pool,
+                                                (col, ids, doc_type)))
+
+        object_map = {}
+        for col, ids in inline:
+            object_map.update(self._fetch(col, ids, doc_type))
+        for result in pending:
+            object_map.update(result.get())
+        return object_map
+
+    def _get_db_alias(self, col, doc_type=None):
+        """Returns the alias of the database the references to `col` are
+        fetched from.
+        """
+        if hasattr(col, 'objects'):
+            return col._meta.get('db_alias', DEFAULT_DB_ALIAS)
+        if doc_type and not isinstance(doc_type, (ListField, DictField, MapField)):
+            return doc_type._meta.get('db_alias', DEFAULT_DB_ALIAS)
+        return DEFAULT_DB_ALIAS
+
+    def _fetch_in_pool(self, col, ids, doc_type=None):
+        """Runs :meth:`_fetch` in a thread of a dereference pool.
+        """
+        _local.in_pool = True
+        try:
+            return self._fetch(col, ids, doc_type)
+        finally:
+            _local.in_pool = False
+
+    def _fetch(self, col, ids, doc_type=None):
+        """Fetch the documents of `col` with the given ids, returns a dict
+        mapping the ids to the documents.
         """
         object_map = {}
-        for col, dbrefs in self.reference_map.iteritems():
-            keys = object_map.keys()
-            refs = list(set([dbref for dbref in dbrefs if str(dbref) not in keys]))
-            if hasattr(col, 'objects'):  # We have a document class for the refs
-                references = col.objects.in_bulk(refs)
-                for key, doc in references.iteritems():
-                    object_map[key] = doc
-            else:  # Generic reference: use the refs data to convert to document
-                if doc_type and not isinstance(doc_type, (ListField, DictField, MapField,) ):
-                    references = doc_type._get_db()[col].find({'_id': {'$in': refs}})
-                    for ref in references:
-                        doc = doc_type._from_son(ref)
-                        object_map[doc.id] = doc
+        if hasattr(col, 'objects'):  # We have a document class for the refs
+            return col.objects.in_bulk(ids)
+        # Generic reference: use the refs data to convert to document
+        if doc_type and not isinstance(doc_type, (ListField, DictField, MapField,) ):
+            references = doc_type._get_db()[col].find({'_id': {'$in': ids}})
+            for ref in references:
+                doc = doc_type._from_son(ref)
+                object_map[doc.id] = doc
+        else:
+            references = get_db()[col].find({'_id': {'$in': ids}})
+            for ref in references:
+                if '_cls' in ref:
+                    doc = get_document(ref["_cls"])._from_son(ref)
                 else:
-                    references = get_db()[col].find({'_id': {'$in': refs}})
-                    for ref in references:
-                        if '_cls' in ref:
-                            doc = get_document(ref["_cls"])._from_son(ref)
-                        else:
-                            doc = doc_type._from_son(ref)
-                        object_map[doc.id] = doc
+                    doc = doc_type._from_son(ref)
+                object_map[doc.id] = doc
         return object_map
 
     def _attach_objects(self, items, depth=0, instance=None, name=None):
@@ -142,7 +198,7 @@ class DeReference(object):
             if '_ref' in items:
                 return self.object_map.get(items['_ref'].id, items)
             elif '_cls' in items:
-                doc = get_document(items['_cls'])._from_son(items)
+                doc = get_document(items['_cls'])._from_son(items, lazy=False)
                 doc._data = self._attach_objects(doc._data, depth, doc, name)
                 return doc
 
@@ -165,6 +221,7 @@ class DeReference(object):
             if k in self.object_map:
                 data[k] = self.object_map[k]
             elif hasattr(v, '_fields'):
+                v._load_lazy_fields()
                 for field_name, field in v._fields.iteritems():
                     v = data[k]._data.get(field_name, None)
                     if isinstance(v, (DBRef)):
@@ -175,6 +232,7 @@ class DeReference(object):
                         data[k]._data[field_name] = self._attach_objects(v, depth, instance=instance, name=name)
                     elif isinstance(v, (list, tuple)) and depth <= self.max_depth:
                         data[k]._data[field_name] = self._attach_objects(v, depth, instance=instance, name=name)
+                data[k]._link_fields()
             elif isinstance(v, (dict, list, tuple)) and depth <= self.max_depth:
                 data[k] = self._attach_objects(v, depth - 1, instance=instance, name=name)
             elif hasattr(v, 'id'):
@@ -186,3 +244,153 @@ class DeReference(object):
             return BaseDict(data, instance, name)
         depth += 1
         return data
+
+
+class LookupJoin(object):
+    """Loads the documents of a queryset together with the documents their
+    reference fields point to, using one aggregation with a ``$lookup`` per
+    joined field.
+    """
+
+    def __call__(self, queryset, fields):
+        """
+        Returns the list of documents of `queryset` with `fields` joined.
+
+        :param queryset: the :class:`~mongoengine.queryset.QuerySet` to load
+        :param fields: the (dotted) names of the reference fields to join
+        """
+        joins = self._get_joins(queryset._document, fields)
+
+        stages = []
+        for i, (parent, field_name, field, document) in enumerate(joins):
+            source = None
+            if parent is not None:
+                source = '$_join_%d' % parent
+            stages.append({'$addFields': {
+                '_join_ids_%d' % i: self._ids_expression(source, field)}})
+            stages.append({'$lookup': {
+                'from': document._get_collection_name(),
+                'localField': '_join_ids_%d' % i,
+                'foreignField': '_id',
+                'as': '_join_%d' % i}})
+        if joins:
+            stages.append({'$project': dict(('_join_ids_%d' % i, 0)
+                                            for i in xrange(len(joins)))})
+
+        pipeline = queryset._get_initial_stages() + stages
+        results = []
+        for son in queryset._read_collection.aggregate(pipeline):
+            joined = [son.pop('_join_%d' % i, []) for i in xrange(len(joins))]
+            doc = queryset._document._from_son(son, lazy=False)
+
+            object_maps = []
+            for i, (parent, field_name, field, document) in enumerate(joins):
+                object_map = dict((ref_son['_id'],
+                                   document._from_son(ref_son, lazy=False))
+                                  for ref_son in joined[i])
+                object_maps.append(object_map)
+                if parent is None:
+                    sources = [doc]
+                else:
+                    sources = object_maps[parent].values()
+                for source in sources:
+                    self._attach(source, field_name, object_map)
+
+            if queryset._scalar:
+                doc = queryset._get_scalar(doc)
+            results.append(doc)
+        return results
+
+    @classmethod
+    def get_reference_paths(cls, document, max_depth=1):
+        """Returns the paths of the reference fields of `document`, and of
+        the documents they reference up to `max_depth` levels.
+        """
+        paths = []
+        if max_depth < 1:
+            return paths
+        for field_name, field in document._fields.iteritems():
+            target = cls._get_document_type(field)
+            if target is None:
+                continue
+            paths.append(field_name)
+            for path in cls.get_reference_paths(target, max_depth - 1):
+                paths.append('%s.%s' % (field_name, path))
+        return paths
+
+    @classmethod
+    def _get_document_type(cls, field):
+        """Returns the document class referenced by a
+        :class:`~mongoengine.ReferenceField` or a list of them, else
+        ``None``.
+        """
+        if isinstance(field, ListField):
+            field = field.field
+        if isinstance(field, ReferenceField):
+            return field.document_type
+        return None
+
+    def _get_joins(self, document, fields):
+        """Returns a ``(parent, field_name, field, document)`` tuple for each
+        join, parents first.  `parent` is the index of the join loading the
+        documents that hold the field, ``None`` for the queryset's documents.
+        """
+        joins = []
+        indexes = {}
+        for path in fields:
+            parent = None
+            doc_cls = document
+            parts = path.split('.')
+            for depth, field_name in enumerate(parts):
+                key = tuple(parts[:depth + 1])
+                field = doc_cls._fields.get(field_name)
+                target = self._get_document_type(field)
+                if target is None:
+                    raise InvalidQueryError('Cannot join "%s", it is not a '
+                                            'reference field' % path)
+                if key not in indexes:
+                    indexes[key] = len(joins)
+                    joins.append((parent, field_name, field, target))
+                parent = indexes[key]
+                doc_cls = target
+        return joins
+
+    def _ids_expression(self, source, field):
+        """Returns the aggregation expression listing the ids referenced by
+        `field` in the document, or in each of the documents of the array,
+        at `source`.
+        """
+        def ref_id(ref):
+            # The id of a DBRef, "$id" can't be used in a field path
+            values = {'$map': {'input': {'$objectToArray': ref}, 'as': 'kv',
+                               'in': '$$kv.v'}}
+            return {'$arrayElemAt': [values, 1]}
+
+        def ref_ids(refs):
+            return {'$map': {'input': {'$ifNull': [refs, []]}, 'as': 'ref',
+                             'in': ref_id('$$ref')}}
+
+        is_list = isinstance(field, ListField)
+        if source is None:
+            path = '$' + field.db_field
+            return ref_ids(path) if is_list else ref_id(path)
+        if is_list:
+            # Flatten the lists of ids of the documents
+            return {'$reduce': {
+                'input': source, 'initialValue': [],
+                'in': {'$concatArrays': [
+                    '$$value', ref_ids('$$this.' + field.db_field)]}}}
+        return {'$map': {'input': source, 'as': 'doc',
+                         'in': ref_id('$$doc.' + field.db_field)}}
+
+    def _attach(self, document, field_name, object_map):
+        """Replaces the DBRefs held by `field_name` of `document` with the
+        documents of `object_map` they refer to.
+        """
+        value = document._data.get(field_name)
+        if isinstance(value, DBRef):
+            document._data[field_name] = object_map.get(value.id, value)
+        elif isinstance(value, (list, tuple)):
+            document._data[field_name] = [
+                object_map.get(item.id, item) if isinstance(item, DBRef)
+                else item for item in value]
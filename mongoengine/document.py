@@ -3,8 +3,10 @@ from bson.dbref import DBRef
 
 from mongoengine import signals
 from base import (DocumentMetaclass, TopLevelDocumentMetaclass, BaseDocument,
-                  BaseDict, BaseList)
-from queryset import OperationError
+                  BaseDict, BaseList, ChangedFields)
+from queryset import OperationError, QuerySet
+from sessions import active_session
+from writebehind import get_buffer
 from connection import get_db, DEFAULT_CONNECTION_NAME
 
 __all__ = ['Document', 'EmbeddedDocument', 'DynamicDocument',
@@ -26,7 +28,7 @@ class EmbeddedDocument(BaseDocument):
 
     def __init__(self, *args, **kwargs):
         super(EmbeddedDocument, self).__init__(*args, **kwargs)
-        self._changed_fields = []
+        self._changed_fields = ChangedFields()
 
     def __delattr__(self, *args, **kwargs):
         """Handle deletions of fields"""
@@ -72,6 +74,22 @@ class Document(BaseDocument):
     dictionary. The value should be a list of field names or tuples of field
     names. Index direction may be specified by prefixing the field names with
     a **+** or **-** sign.
+
+    Documents are converted to and from their MongoDB representation using
+    field tables built when the class is created. To go through each field's
+    descriptor instead, set :attr:`compile_serializers` to ``False`` in the
+    :attr:`meta` dictionary. Setting :attr:`lazy_decode` to ``True`` converts
+    the fields of loaded documents only when they are first accessed.
+
+    Setting :attr:`validate_changed_only` to ``True`` in the :attr:`meta`
+    dictionary makes saves of existing documents validate only the values
+    that changed, besides checking the required fields are present.
+
+    Documents that are only ever inserted, such as log entries, may be written
+    in the background by setting :attr:`write_behind` in the :attr:`meta`
+    dictionary to ``True`` or to a dictionary of :attr:`max_batch`,
+    :attr:`max_delay_ms` and :attr:`max_size` options of the
+    :class:`~mongoengine.writebehind.WriteBehindBuffer` holding them.
     """
     __metaclass__ = TopLevelDocumentMetaclass
 
@@ -102,6 +120,21 @@ class Document(BaseDocument):
                 classes += subcls._get_subdocuments()
         return classes
 
+    @classmethod
+    def _get_class_query(cls):
+        """Returns the query matching the documents of this class and its
+        subclasses by their ``_cls``, an equality match if it has no
+        subclasses.  The class names are kept until a subclass is defined.
+        """
+        names = cls.__dict__.get('_class_names')
+        if names is None:
+            names = [subcls._class_name for subcls in cls._get_subdocuments()]
+            names = tuple(names + [cls._class_name])
+            cls._class_names = names
+        if len(names) == 1:
+            return {'_cls': names[0]}
+        return {'_cls': {'$in': list(names)}}
+
     @classmethod
     def _get_collection(cls):
         """Returns the collection for the document."""
@@ -138,8 +171,22 @@ class Document(BaseDocument):
                 cls._collection = db[collection_name]
         return cls._collection
 
+    def validate(self, changed_only=None):
+        """Ensure that all fields' values are valid and that required fields
+        are present.
+
+        :param changed_only: only validate the values changed since the
+            document was loaded or saved, and check that the required fields
+            are present.  Defaults to :attr:`validate_changed_only` in the
+            :attr:`meta` for documents that exist in the database.
+        """
+        if changed_only is None:
+            changed_only = (self._meta.get('validate_changed_only', False) and
+                            not self._created and self.pk is not None)
+        super(Document, self).validate(changed_only=changed_only)
+
     def save(self, force_insert=False, validate=True, write_options=None,
-            cascade=None, cascade_kwargs=None, _refs=None):
+            cascade=None, cascade_kwargs=None, refresh=False, _refs=None):
         """Save the :class:`~mongoengine.Document` to the database. If the
         document already exists, it will be updated, otherwise it will be
         created.
@@ -153,10 +200,14 @@ class Document(BaseDocument):
                 which will be used as options for the resultant ``getLastError`` command.
                 For example, ``save(..., w=2, fsync=True)`` will wait until at least two servers
                 have recorded the write and will force an fsync on each server being written to.
+                The legacy ``safe`` flag is translated to ``w``.
         :param cascade: Sets the flag for cascading saves.  You can set a default by setting
             "cascade" in the document __meta__
         :param cascade_kwargs: optional kwargs dictionary to be passed throw to cascading saves
-        :param _refs: A list of processed references used in cascading saves
+        :param refresh: when updating an existing document, apply the changes
+            with findAndModify and reload the fields from the stored document
+            it returns, in the same round trip
+        :param _refs: The set of ids of the documents processed in cascading saves
 
         .. versionchanged:: 0.5
             In existing documents it only saves changed fields using set / unset
@@ -167,43 +218,67 @@ class Document(BaseDocument):
             control then you can turn off using document meta['cascade'] = False
             Also you can pass different kwargs to the cascade save using cascade_kwargs
             which overwrites the existing kwargs with custom values
-
+        .. versionchanged:: 0.6.18
+            Sets and unsets are sent in a single update, added refresh
+
+        Inside a :func:`~mongoengine.session` the save is only recorded and
+        happens when the session is flushed, unless `force_insert` or
+        `refresh` are given.  The session then validates the document and
+        cascades the save as requested, and sends `pre_bulk_save` and
+        `post_bulk_save` instead of `pre_save` and `post_save`.
+        `write_options` can't be given, those of the session are used.
+
+        If :attr:`write_behind` is set in the document's :attr:`meta`, saves
+        with `force_insert` only add the document to a buffer inserted by a
+        background thread, see :meth:`flush_write_behind`.  `post_save` is
+        sent once the document is buffered.
         """
-        signals.pre_save.send(self.__class__, document=self)
+        session = active_session()
+        if session is not None and not (force_insert or refresh):
+            session.save(self, validate=validate,
+                         write_options=write_options, cascade=cascade,
+                         cascade_kwargs=cascade_kwargs)
+            return
+
+        if signals.pre_save.receivers:
+            signals.pre_save.send(self.__class__, document=self)
 
         if validate:
             self.validate()
 
         if not write_options:
             write_options = {"w": 1}
+        else:
+            write_options = QuerySet._write_options(write_options)
 
-        doc = self.to_mongo()
-
-        created = force_insert or '_id' not in doc
+        id_field = self._meta['id_field']
+        created = force_insert or self[id_field] is None
 
         try:
             collection = self.__class__.objects._collection
             if created:
-                if force_insert:
+                doc = self.to_mongo()
+                write_behind = force_insert and get_buffer(self.__class__)
+                if write_behind:
+                    object_id = write_behind.put(doc)
+                elif force_insert:
                     object_id = collection.insert(doc, **write_options)
                 else:
                     object_id = collection.save(doc, **write_options)
             else:
-                object_id = doc['_id']
-                updates, removals = self._delta()
-
-                # Need to add shard key to query, or you get an error
-                select_dict = {'_id': object_id}
-                shard_key = self.__class__._meta.get('shard_key', tuple())
-                for k in shard_key:
-                    actual_key = self._db_field_map.get(k, k)
-                    select_dict[actual_key] = doc[actual_key]
-
+                select_dict, update = self._get_update()
+                object_id = select_dict['_id']
                 upsert = self._created
-                if updates:
-                    collection.update(select_dict, {"$set": updates}, upsert=upsert, **write_options)
-                if removals:
-                    collection.update(select_dict, {"$unset": removals}, upsert=upsert, **write_options)
+                if update and refresh:
+                    collection = collection.with_options(
+                        write_concern=QuerySet._write_concern(write_options))
+                    son = collection.find_one_and_update(
+                        select_dict, update, upsert=upsert,
+                        return_document=pymongo.ReturnDocument.AFTER)
+                    if son is not None:
+                        self._reload_from(self.__class__._from_son(son))
+                elif update:
+                    collection.update(select_dict, update, upsert=upsert, **write_options)
 
             cascade = self._meta.get('cascade', True) if cascade is None else cascade
             if cascade:
@@ -223,29 +298,95 @@ class Document(BaseDocument):
             if u'duplicate key' in unicode(err):
                 message = u'Tried to save duplicate unique keys (%s)'
             raise OperationError(message % unicode(err))
-        id_field = self._meta['id_field']
-        self[id_field] = self._fields[id_field].to_python(object_id)
-
-        self._changed_fields = []
+        self._saved(object_id, created=created)
+        if signals.post_save.receivers:
+            signals.post_save.send(self.__class__, document=self,
+                                   created=created)
+
+    def _saved(self, object_id=None, created=False):
+        """Updates the document once it has been written to the database,
+        setting its id if given and forgetting its changes.
+        """
+        if object_id is not None:
+            id_field = self._meta['id_field']
+            self[id_field] = self._fields[id_field].to_python(object_id)
+        self._clear_changed_fields(everything=created)
         self._created = False
-        signals.post_save.send(self.__class__, document=self, created=created)
+
+    def _get_update(self):
+        """Returns the query selecting the document and the update applying
+        its changes, used to save an existing document.
+        """
+        updates, removals = self._delta()
+
+        # Need to add shard key to query, or you get an error
+        select_dict = {'_id': self._get_mongo_value(['_id'])}
+        shard_key = self.__class__._meta.get('shard_key', tuple())
+        for k in shard_key:
+            actual_key = self._db_field_map.get(k, k)
+            select_dict[actual_key] = self._get_mongo_value([actual_key])
+
+        update = {}
+        if updates:
+            update["$set"] = updates
+        if removals:
+            update["$unset"] = removals
+        return select_dict, update
 
     def cascade_save(self, *args, **kwargs):
-        """Recursively saves any references / generic references on an object"""
-        from fields import ReferenceField, GenericReferenceField
-        _refs = kwargs.get('_refs', []) or []
-        for name, cls in self._fields.items():
-            if not isinstance(cls, (ReferenceField, GenericReferenceField)):
-                continue
-            ref = getattr(self, name)
-            if not ref:
-                continue
-            ref_id = "%s,%s" % (ref.__class__.__name__, str(ref._data))
-            if ref and ref_id not in _refs:
-                _refs.append(ref_id)
-                kwargs["_refs"] = _refs
-                ref.save(**kwargs)
-                ref._changed_fields = []
+        """Recursively saves any references / generic references on an object
+        that have changes.  References that haven't been dereferenced are left
+        alone, and the changed ones are saved in bulk, one set per document
+        class, so they send the `pre_bulk_save` and `post_bulk_save` signals.
+
+        .. versionchanged:: 0.6.18
+            Only saves changed references, in bulk
+        """
+        validate = kwargs.get('validate', True)
+        _refs = kwargs.get('_refs')
+        if _refs is None:
+            _refs = set()
+        _refs.add(id(self))
+
+        # Walk every loaded reference, as unchanged ones may refer to changed
+        # documents, collecting the changed ones by class
+        changed = {}
+        classes = []
+        stack = [self]
+        while stack:
+            document = stack.pop()
+            for name in document._get_reference_field_names():
+                ref = document._data.get(name)
+                if not isinstance(ref, Document) or id(ref) in _refs:
+                    continue
+                _refs.add(id(ref))
+                stack.append(ref)
+                if not (ref._created or ref._changed_fields or
+                        ref._dirty_fields):
+                    continue
+                if validate:
+                    ref.validate()
+                if ref.__class__ not in changed:
+                    changed[ref.__class__] = []
+                    classes.append(ref.__class__)
+                changed[ref.__class__].append(ref)
+
+        for document_cls in classes:
+            document_cls.objects.bulk_save(
+                changed[document_cls], ordered=True, validate=False,
+                write_options=kwargs.get('write_options'))
+
+    @classmethod
+    def _get_reference_field_names(cls):
+        """Returns the names of the reference and generic reference fields
+        followed by :meth:`cascade_save`.
+        """
+        if '_reference_field_names' not in cls.__dict__:
+            from fields import ReferenceField, GenericReferenceField
+            cls._reference_field_names = tuple(
+                name for name, field in cls._fields.items()
+                if isinstance(field, (ReferenceField, GenericReferenceField)))
+        return cls._reference_field_names
 
     def update(self, **kwargs):
         """Performs an update on the :class:`~mongoengine.Document`
@@ -262,13 +403,27 @@ class Document(BaseDocument):
         shard_key = self.__class__._meta.get('shard_key', tuple())
         for k in shard_key:
             select_dict[k] = getattr(self, k)
-        return self.__class__.objects(**select_dict).update_one(**kwargs)
+        queryset = self.__class__.objects(**select_dict)
+
+        session = active_session()
+        if session is not None:
+            session.update(self, queryset._query, kwargs)
+            return
+        return queryset.update_one(**kwargs)
 
     def delete(self, w=1):
         """Delete the :class:`~mongoengine.Document` from the database. This
         will only take effect if the document has been previously saved.
+        Inside a :func:`~mongoengine.session` it happens when the session is
+        flushed.
         """
-        signals.pre_delete.send(self.__class__, document=self)
+        session = active_session()
+        if session is not None:
+            session.delete(self)
+            return
+
+        if signals.pre_delete.receivers:
+            signals.pre_delete.send(self.__class__, document=self)
 
         try:
             self.__class__.objects(pk=self.pk).delete(w=w)
@@ -276,7 +431,8 @@ class Document(BaseDocument):
             message = u'Could not delete document (%s)' % err.message
             raise OperationError(message)
 
-        signals.post_delete.send(self.__class__, document=self)
+        if signals.post_delete.receivers:
+            signals.post_delete.send(self.__class__, document=self)
 
     def select_related(self, max_depth=1):
         """Handles dereferencing of :class:`~bson.dbref.DBRef` objects to
@@ -285,7 +441,9 @@ class Document(BaseDocument):
         .. versionadded:: 0.5
         """
         from dereference import DeReference
+        self._load_lazy_fields()
         self._data = DeReference()(self._data, max_depth)
+        self._link_fields()
         return self
 
     def reload(self, max_depth=1):
@@ -298,13 +456,21 @@ class Document(BaseDocument):
         obj = self.__class__.objects(
             **{id_field: self[id_field]}
         ).first()
+        self._reload_from(obj)
+        return self
+
+    def _reload_from(self, obj):
+        """Sets the fields of the document to those of `obj`, a copy of it
+        loaded from the database.
+        """
         for field in self._fields:
             setattr(self, field, self._reload(field, obj[field]))
         if self._dynamic:
             for name in self._dynamic_fields.keys():
                 setattr(self, name, self._reload(name, obj._data[name]))
         self._changed_fields = obj._changed_fields
-        return obj
+        self.__dict__.pop('_dirty_fields', None)
+        self._link_fields()
 
     def _reload(self, key, value):
         """Used by :meth:`~mongoengine.Document.reload` to ensure the
@@ -317,7 +483,7 @@ class Document(BaseDocument):
             value = [self._reload(key, v) for v in value]
             value = BaseList(value, self, key)
         elif isinstance(value, (EmbeddedDocument, DynamicEmbeddedDocument)):
-            value._changed_fields = []
+            value._changed_fields = ChangedFields()
         return value
 
     def to_dbref(self):
@@ -335,6 +501,16 @@ class Document(BaseDocument):
         """
         cls._meta['delete_rules'][(document_cls, field_name)] = rule
 
+    @classmethod
+    def flush_write_behind(cls):
+        """Waits until the documents saved with :attr:`write_behind` set in
+        the :attr:`meta` have been inserted.  Raises
+        :class:`~mongoengine.queryset.OperationError` if some couldn't be.
+        """
+        write_behind = get_buffer(cls)
+        if write_behind is not None:
+            write_behind.flush()
+
     @classmethod
     def drop_collection(cls):
         """Drops the entire collection associated with this
@@ -1,20 +1,59 @@
+import sys
 import pprint
 import re
 import copy
+import base64
 import itertools
 import operator
+import collections
+import threading
+import Queue
 
 import pymongo
+from bson import BSON, SON
 from bson.code import Code
 
 from mongoengine import signals
 
-__all__ = ['queryset_manager', 'Q', 'InvalidQueryError',
+__all__ = ['queryset_manager', 'Q', 'InvalidQueryError', 'BulkSaveError',
            'DO_NOTHING', 'NULLIFY', 'CASCADE', 'DENY']
 
 
 # The maximum number of items to display in a QuerySet.__repr__
 REPR_OUTPUT_SIZE = 20
+# The number of results a cached QuerySet loads at a time while iterating
+ITER_CHUNK_SIZE = 100
+
+# Query operators
+OPERATORS = frozenset(['ne', 'gt', 'gte', 'lt', 'lte', 'in', 'nin', 'mod',
+                       'all', 'size', 'exists', 'not'])
+GEO_OPERATORS = frozenset(['within_distance', 'within_spherical_distance',
+                           'within_box', 'within_polygon', 'near',
+                           'near_sphere'])
+MATCH_OPERATORS = frozenset(['contains', 'icontains', 'startswith',
+                             'istartswith', 'endswith', 'iendswith',
+                             'exact', 'iexact'])
+CUSTOM_OPERATORS = frozenset(['match'])
+QUERY_OPERATORS = OPERATORS | GEO_OPERATORS | MATCH_OPERATORS | CUSTOM_OPERATORS
+# Operators whose value is prepared as a single value of the field
+SINGULAR_OPERATORS = frozenset([None, 'ne', 'gt', 'gte', 'lt', 'lte',
+                                'not']) | MATCH_OPERATORS
+
+# Aggregation stages after which documents no longer have the fields of
+# the queryset's document, field names are not translated past them
+RESHAPING_STAGES = frozenset(['$group', '$project', '$replaceRoot', '$bucket',
+                              '$bucketAuto', '$facet', '$count',
+                              '$sortByCount'])
+
+# The write options pymongo accepts as a write concern
+WRITE_CONCERN_OPTIONS = frozenset(['w', 'wtimeout', 'j', 'fsync'])
+
+# The number of query plans and field paths cached before the caches are
+# cleared
+MAX_QUERY_PLANS = 10000
+_query_plans = {}
+MAX_FIELD_PATHS = 10000
+_field_paths = {}
 
 # Delete rules
 DO_NOTHING = 0
@@ -39,6 +78,18 @@ class OperationError(Exception):
     pass
 
 
+class BulkSaveError(OperationError):
+    """Raised by :meth:`~mongoengine.queryset.QuerySet.bulk_save` when some
+    of the documents couldn't be saved.  ``errors`` maps the position of each
+    of those documents in ``documents`` to its error.
+    """
+
+    def __init__(self, message, errors=None, documents=None):
+        super(BulkSaveError, self).__init__(message)
+        self.errors = errors or {}
+        self.documents = documents or []
+
+
 RE_TYPE = type(re.compile(''))
 
 
@@ -85,7 +136,7 @@ class SimplificationVisitor(QNodeVisitor):
                 raise InvalidQueryError(msg + ', '.join(intersection))
 
             query_ops.update(ops)
-            combined_query.update(copy.deepcopy(query))
+            combined_query.update(query)
         return combined_query
 
 
@@ -185,7 +236,9 @@ class QueryCompilerVisitor(QNodeVisitor):
                         raise InvalidQueryError(msg + ', '.join(intersection))
 
                     # Right! We've got two non-overlapping dicts of operations!
-                    combined_query[field].update(copy.deepcopy(ops))
+                    # Merge them into a copy rather than changing either
+                    combined_query[field] = dict(combined_query[field])
+                    combined_query[field].update(ops)
         return combined_query
 
 
@@ -244,11 +297,12 @@ class QCombination(QNode):
                 self.children.append(node)
 
     def accept(self, visitor):
-        for i in range(len(self.children)):
-            if isinstance(self.children[i], QNode):
-                self.children[i] = self.children[i].accept(visitor)
-
-        return visitor.visit_combination(self)
+        # Visit a copy, query trees are shared between cloned querysets
+        combination = copy.copy(self)
+        combination.children = [node.accept(visitor)
+                                 if isinstance(node, QNode) else node
+                                 for node in self.children]
+        return visitor.visit_combination(combination)
 
     @property
     def empty(self):
@@ -272,14 +326,16 @@ class Q(QNode):
 
 
 class QueryFieldList(object):
-    """Object that handles combinations of .only() and .exclude() calls"""
+    """Object that handles combinations of .only() and .exclude() calls.
+    Adding a field list returns a new one, so cloned querysets can share it.
+    """
     ONLY = 1
     EXCLUDE = 0
 
     def __init__(self, fields=[], value=ONLY, always_include=[]):
         self.value = value
-        self.fields = set(fields)
-        self.always_include = set(always_include)
+        self.fields = frozenset(fields)
+        self.always_include = frozenset(always_include)
         self._id = None
 
     def as_dict(self):
@@ -289,31 +345,33 @@ class QueryFieldList(object):
         return field_list
 
     def __add__(self, f):
-        if not self.fields:
-            self.fields = f.fields
-            self.value = f.value
-        elif self.value is self.ONLY and f.value is self.ONLY:
-            self.fields = self.fields.intersection(f.fields)
-        elif self.value is self.EXCLUDE and f.value is self.EXCLUDE:
-            self.fields = self.fields.union(f.fields)
-        elif self.value is self.ONLY and f.value is self.EXCLUDE:
-            self.fields -= f.fields
-        elif self.value is self.EXCLUDE and f.value is self.ONLY:
-            self.value = self.ONLY
-            self.fields = f.fields - self.fields
+        field_list = copy.copy(self)
+        if not field_list.fields:
+            field_list.fields = f.fields
+            field_list.value = f.value
+        elif field_list.value is self.ONLY and f.value is self.ONLY:
+            field_list.fields = field_list.fields.intersection(f.fields)
+        elif field_list.value is self.EXCLUDE and f.value is self.EXCLUDE:
+            field_list.fields = field_list.fields.union(f.fields)
+        elif field_list.value is self.ONLY and f.value is self.EXCLUDE:
+            field_list.fields = field_list.fields - f.fields
+        elif field_list.value is self.EXCLUDE and f.value is self.ONLY:
+            field_list.value = self.ONLY
+            field_list.fields = f.fields - field_list.fields
 
         if '_id' in f.fields:
-            self._id = f.value
+            field_list._id = f.value
 
-        if self.always_include:
-            if self.value is self.ONLY and self.fields:
-                self.fields = self.fields.union(self.always_include)
+        if field_list.always_include:
+            if field_list.value is self.ONLY and field_list.fields:
+                field_list.fields = field_list.fields.union(
+                    field_list.always_include)
             else:
-                self.fields -= self.always_include
-        return self
+                field_list.fields = field_list.fields - field_list.always_include
+        return field_list
 
     def reset(self):
-        self.fields = set([])
+        self.fields = frozenset()
         self.value = self.ONLY
 
     def __nonzero__(self):
@@ -323,6 +381,10 @@ class QueryFieldList(object):
 class QuerySet(object):
     """A set of results returned from a query. Wraps a MongoDB cursor,
     providing :class:`~mongoengine.Document` objects as the results.
+
+    Methods that refine the query (:meth:`filter`, :meth:`limit`,
+    :meth:`only`, :meth:`order_by`, ...) return a new queryset and leave
+    this one unchanged.
     """
 
     __already_indexed = set()
@@ -333,41 +395,65 @@ class QuerySet(object):
         self._mongo_query = None
         self._query_obj = Q()
         self._initial_query = {}
+        self._range_query = None
         self._where_clause = None
         self._loaded_fields = QueryFieldList()
         self._ordering = []
         self._class_check = True
         self._read_preference = None
         self._scalar = []
+        self._lazy = None
+        self._as_pymongo = False
+        self._translate_names = False
+        self._bulk_load_size = None
+        self._use_cache = False
 
         # If inheritance is allowed, only return instances and instances of
         # subclasses of the class being used
         if document._meta.get('allow_inheritance'):
-            cls_list = document._get_subdocuments() + [document]
-            cls_list = [c._class_name for c in cls_list]
-            self._initial_query = {'_cls': {'$in': cls_list}}
+            self._initial_query = document._get_class_query()
             self._loaded_fields = QueryFieldList(always_include=['_cls'])
-        self._cursor_obj = None
         self._limit = None
         self._skip = None
         self._hint = -1  # Using -1 as None is a valid value for hint
+        self._reset_cursor()
+
+    def _reset_cursor(self):
+        """Forget the cursor and anything read from it.
+        """
+        self._cursor_obj = None
+        self._bulk_loaded = None
+        self._result_cache = []
+        self._has_more = True
+        self._cache_iter = None
+
+    def __getstate__(self):
+        """Pickles the query state without the collection and cursor, so
+        that querysets, e.g. those of :meth:`partitions`, can be sent to
+        other processes.
+        """
+        state = self.__dict__.copy()
+        for name in ('_collection_obj', '_cursor_obj', '_bulk_loaded',
+                     '_result_cache', '_has_more', '_cache_iter'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._collection_obj = self._document._get_collection()
+        self._reset_cursor()
 
     def clone(self):
         """Creates a copy of the current :class:`~mongoengine.queryset.QuerySet`
+        with its own cursor.  The query state is never changed in place, so
+        the copy shares it with this queryset instead of copying it.
 
         .. versionadded:: 0.5
+        .. versionchanged:: 0.6.X - no longer deep copies the query state
         """
-        c = self.__class__(self._document, self._collection_obj)
-
-        copy_props = ('_initial_query', '_query_obj', '_where_clause',
-                    '_loaded_fields', '_ordering',
-                    '_limit', '_skip',  '_hint',
-                    '_read_preference',)
-
-        for prop in copy_props:
-            val = getattr(self, prop)
-            setattr(c, prop, copy.deepcopy(val))
-
+        c = self.__class__.__new__(self.__class__)
+        c.__dict__.update(self.__dict__)
+        c._reset_cursor()
         return c
 
     @property
@@ -376,6 +462,9 @@ class QuerySet(object):
             self._mongo_query = self._query_obj.to_query(self._document)
             if self._class_check:
                 self._mongo_query.update(self._initial_query)
+            if self._range_query:
+                self._mongo_query = self._merge_queries(
+                    self._mongo_query, self._range_query)
         return self._mongo_query
 
     def ensure_index(self, key_or_list, drop_dups=False, background=False,
@@ -454,11 +543,11 @@ class QuerySet(object):
         query = Q(**query)
         if q_obj:
             query &= q_obj
-        self._query_obj &= query
-        self._mongo_query = None
-        self._cursor_obj = None
-        self._class_check = class_check
-        return self
+        queryset = self.clone()
+        queryset._query_obj &= query
+        queryset._mongo_query = None
+        queryset._class_check = class_check
+        return queryset
 
     def filter(self, *q_objs, **query):
         """An alias of :meth:`~mongoengine.queryset.QuerySet.__call__`
@@ -490,15 +579,21 @@ class QuerySet(object):
             cursor_args['projection'] = self._loaded_fields.as_dict()
         return cursor_args
 
+    @property
+    def _read_collection(self):
+        """The collection to read from, using the read preference.
+        """
+        collection = self._collection
+        if self._read_preference:
+            collection = collection.with_options(
+                read_preference=self._read_preference)
+        return collection
+
     @property
     def _cursor(self):
         if self._cursor_obj is None:
 
-            collection = self._collection
-            if self._read_preference:
-                collection = collection.with_options(
-                    read_preference=self._read_preference)
-                
+            collection = self._read_collection
             self._cursor_obj = collection.find(
                 self._query, **self._cursor_args)
 
@@ -507,10 +602,11 @@ class QuerySet(object):
                 self._cursor_obj.where(self._where_clause)
 
             # apply default ordering
+            if not self._ordering and self._document._meta['ordering']:
+                self._ordering = self._get_order_by(
+                    self._document._meta['ordering'])
             if self._ordering:
                 self._cursor_obj.sort(self._ordering)
-            elif self._document._meta['ordering']:
-                self.order_by(*self._document._meta['ordering'])
 
             if self._limit is not None:
                 self._cursor_obj.limit(self._limit)
@@ -527,11 +623,34 @@ class QuerySet(object):
     def _lookup_field(cls, document, parts):
         """Lookup a field based on its attribute and return a list containing
         the field's parents and the field.
+
+        .. versionchanged:: 0.6.18
+            Paths are resolved once per document class
         """
         if not isinstance(parts, (list, tuple)):
             parts = [parts]
+        path_key = (document, tuple(parts))
+        fields = _field_paths.get(path_key)
+        if fields is not None:
+            return list(fields)
+
+        fields, dynamic = cls._resolve_field_path(document, parts)
+        # Undeclared fields of dynamic documents get a new field each time
+        if not dynamic:
+            if len(_field_paths) >= MAX_FIELD_PATHS:
+                _field_paths.clear()
+            _field_paths[path_key] = tuple(fields)
+        return fields
+
+    @classmethod
+    def _resolve_field_path(cls, document, parts):
+        """Resolves a path of attribute names for :meth:`_lookup_field`.
+        Returns the list of fields and whether the path starts with an
+        undeclared field of a dynamic document.
+        """
         fields = []
         field = None
+        dynamic = False
 
         for field_name in parts:
             # Handle ListField indexing:
@@ -553,6 +672,7 @@ class QuerySet(object):
                 elif document._dynamic:
                     from base import BaseDynamicField
                     field = BaseDynamicField(db_field=field_name)
+                    dynamic = True
                 else:
                     raise InvalidQueryError('Cannot resolve field "%s"'
                                                 % field_name)
@@ -571,7 +691,7 @@ class QuerySet(object):
                                                 % field_name)
                 field = new_field  # update field to the new field type
             fields.append(field)
-        return fields
+        return fields, dynamic
 
     @classmethod
     def _translate_field_name(cls, doc_cls, field, sep='.'):
@@ -581,61 +701,82 @@ class QuerySet(object):
         parts = [f.db_field for f in QuerySet._lookup_field(doc_cls, parts)]
         return '.'.join(parts)
 
+    @classmethod
+    def _get_query_plan(cls, _doc_cls, key):
+        """Returns the parts of a Django-style query `key` that don't depend
+        on its value: the Mongo key, the operator, whether it is negated and
+        the field that prepares the value.  Plans are cached by document
+        class and key, as applications use the same keys over and over.
+        """
+        plan_key = (_doc_cls, key)
+        plan = _query_plans.get(plan_key)
+        if plan is not None:
+            return plan
+
+        parts = key.split('__')
+        indices = [(i, p) for i, p in enumerate(parts) if p.isdigit()]
+        parts = [part for part in parts if not part.isdigit()]
+        # Check for an operator and transform to mongo-style if there is
+        op = None
+        if parts[-1] in QUERY_OPERATORS:
+            op = parts.pop()
+
+        negate = False
+        if parts[-1] == 'not':
+            parts.pop()
+            negate = True
+
+        field = None
+        if _doc_cls:
+            # Switch field names to proper names [set in Field(name='foo')]
+            fields = QuerySet._lookup_field(_doc_cls, parts)
+            parts = []
+
+            cleaned_fields = []
+            for field in fields:
+                append_field = True
+                if isinstance(field, str):
+                    parts.append(field)
+                    append_field = False
+                else:
+                    parts.append(field.db_field)
+                if append_field:
+                    cleaned_fields.append(field)
+
+            # The field converting the value
+            field = cleaned_fields[-1]
+
+        for i, part in indices:
+            parts.insert(i, part)
+        plan = ('.'.join(parts), op, negate, field)
+
+        if len(_query_plans) >= MAX_QUERY_PLANS:
+            _query_plans.clear()
+        _query_plans[plan_key] = plan
+        return plan
+
     @classmethod
     def _transform_query(cls, _doc_cls=None, _field_operation=False, **query):
         """Transform a query from Django-style format to Mongo format.
-        """
-        operators = ['ne', 'gt', 'gte', 'lt', 'lte', 'in', 'nin', 'mod',
-                     'all', 'size', 'exists', 'not']
-        geo_operators = ['within_distance', 'within_spherical_distance', 'within_box', 'within_polygon', 'near', 'near_sphere']
-        match_operators = ['contains', 'icontains', 'startswith',
-                           'istartswith', 'endswith', 'iendswith',
-                           'exact', 'iexact']
-        custom_operators = ['match']
 
+        .. versionchanged:: 0.6.18
+            The keys are resolved once per document class, see
+            :meth:`_get_query_plan`
+        """
         mongo_query = {}
         for key, value in query.items():
             if key == "__raw__":
-                mongo_query.update(value)
+                # Copied as the conditions may be merged with others
+                mongo_query.update(copy.deepcopy(value))
                 continue
 
-            parts = key.split('__')
-            indices = [(i, p) for i, p in enumerate(parts) if p.isdigit()]
-            parts = [part for part in parts if not part.isdigit()]
-            # Check for an operator and transform to mongo-style if there is
-            op = None
-            if parts[-1] in operators + match_operators + geo_operators + custom_operators:
-                op = parts.pop()
-
-            negate = False
-            if parts[-1] == 'not':
-                parts.pop()
-                negate = True
-
-            if _doc_cls:
-                # Switch field names to proper names [set in Field(name='foo')]
-                fields = QuerySet._lookup_field(_doc_cls, parts)
-                parts = []
-
-                cleaned_fields = []
-                for field in fields:
-                    append_field = True
-                    if isinstance(field, str):
-                        parts.append(field)
-                        append_field = False
-                    else:
-                        parts.append(field.db_field)
-                    if append_field:
-                        cleaned_fields.append(field)
+            key, op, negate, field = cls._get_query_plan(_doc_cls, key)
 
+            if field is not None:
                 # Convert value to proper value
-                field = cleaned_fields[-1]
-
-                singular_ops = [None, 'ne', 'gt', 'gte', 'lt', 'lte', 'not']
-                singular_ops += match_operators
-                if op in singular_ops:
+                if op in SINGULAR_OPERATORS:
                     if isinstance(field, basestring):
-                        if op in match_operators and isinstance(value, basestring):
+                        if op in MATCH_OPERATORS and isinstance(value, basestring):
                             from mongoengine import StringField
                             value = StringField.prepare_query_value(op, value)
                         else:
@@ -648,7 +789,7 @@ class QuerySet(object):
 
             # if op and op not in match_operators:
             if op:
-                if op in geo_operators:
+                if op in GEO_OPERATORS:
                     if op == "within_distance":
                         value = {'$within': {'$center': value}}
                     elif op == "within_spherical_distance":
@@ -664,24 +805,23 @@ class QuerySet(object):
                     else:
                         raise NotImplementedError("Geo method '%s' has not "
                                                   "been implemented" % op)
-                elif op in custom_operators:
+                elif op in CUSTOM_OPERATORS:
                     if op == 'match':
                         value = {"$elemMatch": value}
                     else:
                         NotImplementedError("Custom method '%s' has not "
                                             "been implemented" % op)
-                elif op not in match_operators:
+                elif op not in MATCH_OPERATORS:
                     value = {'$' + op: value}
 
             if negate:
                 value = {'$not': value}
 
-            for i, part in indices:
-                parts.insert(i, part)
-            key = '.'.join(parts)
             if op is None or key not in mongo_query:
                 mongo_query[key] = value
             elif key in mongo_query and isinstance(mongo_query[key], dict):
+                # Merged into a copy, the dict may be a value from the query
+                mongo_query[key] = dict(mongo_query[key])
                 mongo_query[key].update(value)
 
         return mongo_query
@@ -695,20 +835,19 @@ class QuerySet(object):
 
         .. versionadded:: 0.3
         """
-        self.limit(2)
-        self.__call__(*q_objs, **query)
+        queryset = self.limit(2).filter(*q_objs, **query)
         try:
-            result1 = self.next()
+            result1 = queryset.next()
         except StopIteration:
             raise self._document.DoesNotExist("%s matching query does not exist."
                                               % self._document._class_name)
         try:
-            result2 = self.next()
+            result2 = queryset.next()
         except StopIteration:
             return result1
 
-        self.rewind()
-        message = u'%d items returned, instead of 1' % self.count()
+        queryset.rewind()
+        message = u'%d items returned, instead of 1' % queryset.count()
         raise self._document.MultipleObjectsReturned(message)
 
     def get_or_create(self, write_options=None, auto_save=True, *q_objs, **query):
@@ -764,18 +903,36 @@ class QuerySet(object):
             result = None
         return result
 
-    def insert(self, doc_or_docs, load_bulk=True):
+    def insert(self, doc_or_docs, load_bulk=True, batch_size=1000,
+               ordered=True, write_options=None):
         """bulk insert documents
 
         :param docs_or_doc: a document or list of documents to be inserted
         :param load_bulk (optional): If True returns the list of document instances
+        :param batch_size: the number of documents sent in each bulk insert
+        :param ordered: insert the documents in order and stop at the first
+            one that fails, set to ``False`` to try every document
+        :param write_options: extra keyword arguments used as the write concern
+            of the inserts, e.g. ``{'w': 2}``
 
         By default returns document instances, set ``load_bulk`` to False to
-        return just ``ObjectIds``
+        return just ``ObjectIds``.  Either way the ids of the inserted
+        documents are set on the given instances, which are returned rather
+        than loaded again.  Raises :class:`BulkSaveError` if some documents
+        couldn't be inserted, its ``errors`` map the position of each to its
+        error.
+
+        If :attr:`write_behind` is set in the document's :attr:`meta`, the
+        documents are added to a buffer inserted by a background thread, and
+        `post_bulk_insert` is sent once they are buffered.
 
         .. versionadded:: 0.5
+        .. versionchanged:: 0.6.18
+            Inserts in batches and sets the ids rather than reloading the
+            documents, added `batch_size`, `ordered` and `write_options`
         """
         from document import Document
+        from writebehind import get_buffer
 
         docs = doc_or_docs
         return_one = False
@@ -783,7 +940,7 @@ class QuerySet(object):
             return_one = True
             docs = [docs]
 
-        raw = []
+        docs = list(docs)
         for doc in docs:
             if not isinstance(doc, self._document):
                 msg = "Some documents inserted aren't instances of %s" % str(self._document)
@@ -791,23 +948,183 @@ class QuerySet(object):
             if doc.pk:
                 msg = "Some documents have ObjectIds use doc.update() instead"
                 raise OperationError(msg)
-            raw.append(doc.to_mongo())
-
-        signals.pre_bulk_insert.send(self._document, documents=docs)
-        ids = self._collection.insert(raw)
 
-        if not load_bulk:
+        if signals.pre_bulk_insert.receivers:
+            signals.pre_bulk_insert.send(self._document, documents=docs)
+
+        write_behind = get_buffer(self._document)
+        errors = {}
+        ids = []
+        for start in xrange(0, len(docs), batch_size):
+            # Convert a batch at a time to bound the memory used
+            batch = docs[start:start + batch_size]
+            raw = [doc.to_mongo() for doc in batch]
+            if write_behind is not None:
+                inserted = [(doc, write_behind.put(son))
+                            for doc, son in zip(batch, raw)]
+            else:
+                writes = [(start + i, doc, son, pymongo.InsertOne(son))
+                          for i, (doc, son) in enumerate(zip(batch, raw))]
+                inserted = [(doc, son['_id']) for i, doc, son, request in
+                            self._bulk_write(writes, errors, ordered,
+                                             batch_size, write_options)]
+            for doc, obj_id in inserted:
+                doc._saved(obj_id, created=True)
+                ids.append(obj_id)
+            if ordered and errors:
+                break
+
+        if errors:
+            raise BulkSaveError('Could not insert %d of %d documents' %
+                                (len(errors), len(docs)),
+                                errors=errors, documents=docs)
+
+        if signals.post_bulk_insert.receivers:
             signals.post_bulk_insert.send(
-                    self._document, documents=docs, loaded=False)
+                    self._document, documents=docs, loaded=load_bulk)
+        if not load_bulk:
             return return_one and ids[0] or ids
+        return return_one and docs[0] or docs
+
+    def bulk_save(self, docs, ordered=False, batch_size=1000, validate=True,
+                  write_options=None):
+        """Saves a mix of new and existing documents with bulk writes rather
+        than a round trip per document.  New documents are inserted and the
+        changes of existing ones are applied as updates, as
+        :meth:`~mongoengine.Document.save` would, but references are not
+        saved in cascade.
+
+        :param docs: a list of documents to save
+        :param ordered: save the documents in order and stop at the first one
+            that fails, by default every document is tried
+        :param batch_size: the number of writes sent in each bulk operation
+        :param validate: validates the documents; set to ``False`` to skip
+        :param write_options: extra keyword arguments used as the write concern
+            of the bulk writes, e.g. ``{'w': 2}``
+
+        Returns the documents saved.  Raises :class:`BulkSaveError` if some
+        documents couldn't be validated or saved, the others are still saved.
+        """
+        from base import ValidationError
 
-        documents = self.in_bulk(ids)
-        results = []
-        for obj_id in ids:
-            results.append(documents.get(obj_id))
-        signals.post_bulk_insert.send(
-                self._document, documents=results, loaded=True)
-        return return_one and results[0] or results
+        docs = list(docs)
+        for doc in docs:
+            if not isinstance(doc, self._document):
+                msg = "Some documents saved aren't instances of %s" % str(self._document)
+                raise OperationError(msg)
+
+        if signals.pre_bulk_save.receivers:
+            signals.pre_bulk_save.send(self._document, documents=docs)
+
+        # (index, document, raw document if inserted, write request)
+        writes = []
+        errors = {}
+        for index, doc in enumerate(docs):
+            if validate:
+                try:
+                    doc.validate()
+                except ValidationError, err:
+                    errors[index] = err
+                    if ordered:
+                        break
+                    continue
+            raw, request = self._get_save_request(doc)
+            writes.append((index, doc, raw, request))
+
+        saved = []
+        for index, doc, raw, request in self._bulk_write(
+                writes, errors, ordered, batch_size, write_options):
+            doc._saved(raw and raw['_id'], created=raw is not None)
+            saved.append(doc)
+
+        if signals.post_bulk_save.receivers:
+            signals.post_bulk_save.send(self._document, documents=saved)
+        if errors:
+            raise BulkSaveError('Could not save %d of %d documents' %
+                                (len(errors), len(docs)), errors=errors,
+                                documents=docs)
+        return saved
+
+    def _get_save_request(self, doc):
+        """Returns the raw document if `doc` is new, and the bulk write
+        request saving it, ``None`` if there are no changes to save.
+        """
+        if doc.pk is None:
+            raw = doc.to_mongo()
+            return raw, pymongo.InsertOne(raw)
+        select_dict, update = doc._get_update()
+        if not update:
+            return None, None
+        return None, pymongo.UpdateOne(select_dict, update,
+                                       upsert=doc._created)
+
+    @staticmethod
+    def _write_options(write_options):
+        """Returns a copy of `write_options` where the legacy ``safe`` flag,
+        which pymongo 3 no longer accepts, is translated to ``w``.
+        """
+        write_options = dict(write_options)
+        safe = write_options.pop('safe', None)
+        if safe is not None:
+            write_options.setdefault('w', 1 if safe else 0)
+        return write_options
+
+    @staticmethod
+    def _write_concern(write_options):
+        """Returns the :class:`~pymongo.WriteConcern` of `write_options`,
+        leaving out the options of the legacy write methods that aren't part
+        of a write concern, such as ``check_keys``.
+        """
+        write_options = QuerySet._write_options(write_options)
+        return pymongo.WriteConcern(**dict(
+            (key, value) for key, value in write_options.iteritems()
+            if key in WRITE_CONCERN_OPTIONS))
+
+    def _bulk_write(self, writes, errors, ordered=False, batch_size=1000,
+                    write_options=None):
+        """Sends the requests of `writes`, a list of ``(index, document, raw
+        document, request)`` tuples, in bulk writes of `batch_size` requests.
+        The errors of failed writes are added to `errors` under their index.
+        Returns the writes that were applied, or had no request to send.
+        """
+        collection = self._collection
+        if write_options:
+            collection = collection.with_options(
+                write_concern=QuerySet._write_concern(write_options))
+
+        applied = []
+        for start in xrange(0, len(writes), batch_size):
+            batch = writes[start:start + batch_size]
+            requests = [(index, request) for index, doc, raw, request in batch
+                        if request is not None]
+            failed = set()
+            try:
+                if requests:
+                    collection.bulk_write([r for i, r in requests],
+                                          ordered=ordered)
+            except pymongo.errors.BulkWriteError, err:
+                for write_error in err.details['writeErrors']:
+                    index = requests[write_error['index']][0]
+                    message = 'Could not save document (%s)'
+                    if write_error.get('code') in (11000, 11001):
+                        message = u'Tried to save duplicate unique keys (%s)'
+                    errors[index] = OperationError(
+                        message % write_error['errmsg'])
+                    failed.add(index)
+            except pymongo.errors.OperationFailure, err:
+                raise OperationError(u'Could not save documents (%s)' %
+                                     unicode(err))
+
+            # Ordered writes stop at the first failure
+            stopped = ordered and bool(failed)
+            for write in batch:
+                index = write[0]
+                if index in failed or (stopped and index > min(failed)):
+                    continue
+                applied.append(write)
+            if stopped:
+                break
+        return applied
 
     def with_id(self, object_id):
         """Retrieve the object matching the id provided.  Uses `object_id` only
@@ -834,47 +1151,280 @@ class QuerySet(object):
 
         docs = self._collection.find({'_id': {'$in': object_ids}},
                                      **self._cursor_args)
-        if self._scalar:
-            for doc in docs:
-                doc_map[doc['_id']] = self._get_scalar(
-                        self._document._from_son(doc))
+        if self._bulk_load_size and not self._as_pymongo:
+            docs = list(docs)
+            results = self._get_bulk_results(docs)
+            doc_map = dict(zip([doc['_id'] for doc in docs], results))
         else:
             for doc in docs:
-                doc_map[doc['_id']] = self._document._from_son(doc)
+                doc_map[doc['_id']] = self._get_result(doc)
 
         return doc_map
 
     def next(self):
         """Wrap the result in a :class:`~mongoengine.Document` object.
         """
+        if self._use_cache:
+            if self._cache_iter is None:
+                self._cache_iter = self._iter_cache()
+            try:
+                return self._cache_iter.next()
+            except StopIteration:
+                self._cache_iter = None
+                raise
+        return self._next_result()
+
+    def _next_result(self):
+        """Returns the next result read from the cursor.
+        """
         try:
             if self._limit == 0:
                 raise StopIteration
-            if self._scalar:
-                return self._get_scalar(self._document._from_son(
-                        self._cursor.next()))
-            return self._document._from_son(self._cursor.next())
+            if self._bulk_load_size and not self._as_pymongo:
+                if not self._bulk_loaded:
+                    sons = list(itertools.islice(self._cursor,
+                                                 self._bulk_load_size))
+                    if not sons:
+                        raise StopIteration
+                    self._bulk_loaded = collections.deque(
+                        self._get_bulk_results(sons))
+                return self._bulk_loaded.popleft()
+            return self._get_result(self._cursor.next())
         except StopIteration, e:
-            self.rewind()
+            # The result cache is complete, it is not read again
+            if not self._use_cache:
+                self.rewind()
             raise e
 
+    def partitions(self, n, field=None, samples=10):
+        """Split the query into (at most) `n` querysets selecting disjoint
+        ranges of `field`, so that a large collection can be scanned by
+        several threads or processes.  The range boundaries are taken from
+        a random sample of the matching documents, which needs MongoDB 3.2
+        or later.
+
+        Documents whose `field` is missing, or of another type than the
+        sampled values, are not in any range.  Each queryset keeps this
+        queryset's ordering within its own range, and can be pickled to be
+        read in another process.
+
+        :param n: the number of partitions wanted, fewer are returned when
+            the sample has too few distinct values
+        :param field: the field whose values are split, ``_id`` by default;
+            usually the shard key
+        :param samples: the number of sampled values per partition
+        """
+        if self._limit is not None or self._skip is not None:
+            raise InvalidQueryError('Cannot partition a queryset with a '
+                                    'limit or skip')
+        if field is None:
+            key = '_id'
+        else:
+            key = QuerySet._translate_field_name(self._document, field)
+
+        query = self._query
+        split_points = self._get_split_points(query, key, n, samples)
+        bounds = zip([None] + split_points, split_points + [None])
+
+        querysets = []
+        for lower, upper in bounds:
+            condition = {}
+            if lower is not None:
+                condition['$gte'] = lower
+            if upper is not None:
+                condition['$lt'] = upper
+            queryset = self.clone()
+            if condition:
+                # Kept apart from the filters so that refining the
+                # partition keeps its range
+                range_query = {key: condition}
+                if self._range_query:
+                    range_query = self._merge_queries(self._range_query,
+                                                      range_query)
+                queryset._range_query = range_query
+                queryset._mongo_query = None
+            querysets.append(queryset)
+        return querysets
+
+    def _get_split_points(self, query, key, n, samples):
+        """Return up to ``n - 1`` increasing values of the db field `key`
+        that split a random sample of the matching documents evenly.
+        """
+        if n < 2:
+            return []
+        pipeline = [{'$sample': {'size': n * samples}},
+                    {'$project': {key: 1}}]
+        if query:
+            pipeline.insert(0, {'$match': query})
+        values = [self._get_son_value(son, key)
+                  for son in self._read_collection.aggregate(pipeline)]
+        values = sorted(value for value in values if value is not None)
+
+        split_points = []
+        for i in xrange(1, n):
+            if not values:
+                break
+            value = values[len(values) * i // n]
+            if value != values[0] and value not in split_points:
+                split_points.append(value)
+        return split_points
+
+    def parallel_scan(self, workers=4, field=None, samples=10):
+        """Iterate over the results using `workers` threads, each reading
+        one of the querysets returned by :meth:`partitions` with its own
+        cursor.  Results are returned as the threads read them, not in
+        order.
+
+        The threads overlap waiting on the database with decoding results,
+        to use several cores for decoding pass the querysets of
+        :meth:`partitions` to a process pool instead.
+
+        :param workers: the number of threads (and partitions)
+        :param field: the field whose values are split, ``_id`` by default
+        :param samples: the number of sampled values per partition
+        """
+        querysets = self.partitions(workers, field=field, samples=samples)
+        results = Queue.Queue(len(querysets) * 4)
+        stop = threading.Event()
+
+        def put(item):
+            # Give up once the results are no longer read
+            while not stop.is_set():
+                try:
+                    results.put(item, True, 0.1)
+                    return True
+                except Queue.Full:
+                    pass
+            return False
+
+        def scan(queryset):
+            try:
+                chunk = []
+                for result in queryset:
+                    chunk.append(result)
+                    if len(chunk) == ITER_CHUNK_SIZE:
+                        if not put(('results', chunk)):
+                            return
+                        chunk = []
+                put(('results', chunk))
+            except Exception:
+                put(('error', sys.exc_info()))
+            finally:
+                put(('done', None))
+
+        return self._iter_scan(querysets, scan, results, stop)
+
+    def _iter_scan(self, querysets, scan, results, stop):
+        """Starts a thread running `scan` for each queryset and yields the
+        results they put in the `results` queue.
+        """
+        for queryset in querysets:
+            thread = threading.Thread(target=scan, args=(queryset,))
+            thread.daemon = True
+            thread.start()
+
+        try:
+            running = len(querysets)
+            while running:
+                kind, value = results.get()
+                if kind == 'done':
+                    running -= 1
+                elif kind == 'error':
+                    raise value[0], value[1], value[2]
+                else:
+                    for result in value:
+                        yield result
+        finally:
+            stop.set()
+
+    def _get_result(self, son):
+        """Builds the value returned for a PyMongo SON: a document, its
+        scalar values or the SON itself when using :meth:`as_pymongo`.
+        """
+        if self._as_pymongo:
+            return self._get_as_pymongo(son)
+        doc = self._document._from_son(son, lazy=self._lazy)
+        if self._scalar:
+            return self._get_scalar(doc)
+        return doc
+
+    def _get_bulk_results(self, sons):
+        """Builds the documents (or their scalar values) for a batch of
+        PyMongo SONs, sending the bulk load signals instead of the
+        documents' init signals.
+        """
+        doc_cls = self._document
+        if signals.pre_bulk_load.receivers:
+            signals.pre_bulk_load.send(doc_cls, sons=sons)
+        docs = [doc_cls._from_son(son, lazy=self._lazy, init_signals=False)
+                for son in sons]
+        if signals.post_bulk_load.receivers:
+            signals.post_bulk_load.send(doc_cls, documents=docs)
+        if self._scalar:
+            return [self._get_scalar(doc) for doc in docs]
+        return docs
+
     def rewind(self):
-        """Rewind the cursor to its unevaluated state.
+        """Rewind the cursor to its unevaluated state.  A cached queryset
+        only starts over from its first cached result.
 
         .. versionadded:: 0.3
         """
+        self._cache_iter = None
+        if self._use_cache:
+            return
+        self._bulk_loaded = None
         self._cursor.rewind()
 
+    def _fill_cache(self, num=None):
+        """Reads up to `num` more results into the result cache, or all of
+        the remaining results if `num` is ``None``.
+        """
+        while self._has_more and (num is None or num > 0):
+            try:
+                self._result_cache.append(self._next_result())
+            except StopIteration:
+                self._has_more = False
+            if num is not None:
+                num -= 1
+
+    def _iter_cache(self):
+        """Yields the cached results, reading more of them from the cursor
+        as they are needed.
+        """
+        i = 0
+        while True:
+            if i == len(self._result_cache):
+                if not self._has_more:
+                    return
+                self._fill_cache(ITER_CHUNK_SIZE)
+                continue
+            yield self._result_cache[i]
+            i += 1
+
     def count(self):
-        """Count the selected elements in the query.
+        """Count the selected elements in the query.  A cached queryset
+        that has read all of its results counts them without a query.
         """
         if self._limit == 0:
             return 0
+        if self._use_cache and not self._has_more:
+            return len(self._result_cache)
         return self._cursor.count(with_limit_and_skip=True)
 
     def __len__(self):
+        if self._use_cache:
+            self._fill_cache()
+            return len(self._result_cache)
         return self.count()
 
+    def __nonzero__(self):
+        if self._use_cache:
+            if not self._result_cache:
+                self._fill_cache(1)
+            return bool(self._result_cache)
+        return self.count() > 0
+
     def map_reduce(self, map_f, reduce_f, output, finalize_f=None, limit=None,
                    scope=None):
         """Perform a map/reduce query using the current query spec
@@ -930,7 +1480,10 @@ class QuerySet(object):
         reduce_f_code = self._sub_js_fields(reduce_f)
         reduce_f = Code(reduce_f_code, reduce_f_scope)
 
-        mr_args = {'query': self._query}
+        query = self._query
+        if self._where_clause:
+            query = dict(query, **{'$where': self._where_clause})
+        mr_args = {'query': query}
 
         if finalize_f:
             finalize_f_scope = {}
@@ -971,10 +1524,9 @@ class QuerySet(object):
 
         :param n: the maximum number of objects to return
         """
-        self._limit = n
-
-        # Return self to allow chaining
-        return self
+        queryset = self.clone()
+        queryset._limit = n
+        return queryset
 
     def skip(self, n):
         """Skip `n` documents before returning the results. This may also be
@@ -982,8 +1534,125 @@ class QuerySet(object):
 
         :param n: the number of objects to skip before returning results
         """
-        self._skip = n
-        return self
+        queryset = self.clone()
+        queryset._skip = n
+        return queryset
+
+    def paginate_after(self, after=None, page_size=20):
+        """Return the page of up to `page_size` results that follows
+        `after`, and a token to pass as `after` for the next page.  Unlike
+        :meth:`skip`, each page is found with a range query on the ordering
+        keys, so deep pages are as fast as the first one. ::
+
+            page, token = Post.objects.order_by('-date').paginate_after()
+            while token:
+                page, token = Post.objects.order_by('-date').paginate_after(
+                    token)
+
+        The results are ordered by the queryset's ordering (or the
+        document's default ordering) followed by ``_id``, which breaks ties.
+        Ordering keys should be present in every document, as documents
+        missing them do not match the range query.
+
+        :param after: the token returned with the previous page, or the
+            last document of that page; ``None`` for the first page
+        :param page_size: the maximum number of results in the page
+        :returns: a ``(results, token)`` tuple, the token is ``None`` when
+            there are no more results
+        """
+        ordering = list(self._ordering or
+                        self._get_order_by(self._document._meta['ordering']))
+        if '_id' not in [key for key, direction in ordering]:
+            ordering.append(('_id', pymongo.ASCENDING))
+        keys = [key for key, direction in ordering]
+
+        queryset = self.clone()
+        queryset._ordering = ordering
+        queryset._limit = page_size
+        queryset._skip = None
+        if after is not None:
+            if isinstance(after, basestring):
+                values = self._decode_page_token(after, ordering)
+            else:
+                son = after.to_mongo()
+                values = [self._get_son_value(son, key) for key in keys]
+            queryset._mongo_query = self._merge_queries(
+                self._query, self._get_keyset_query(ordering, values))
+
+        # The ordering keys are needed to build the next token
+        if queryset._loaded_fields:
+            loaded_fields = copy.copy(queryset._loaded_fields)
+            if loaded_fields.value is QueryFieldList.ONLY:
+                loaded_fields.fields = loaded_fields.fields.union(keys)
+            else:
+                loaded_fields.fields = loaded_fields.fields.difference(keys)
+            if loaded_fields._id == QueryFieldList.EXCLUDE:
+                loaded_fields._id = None
+            queryset._loaded_fields = loaded_fields
+
+        sons = list(queryset._cursor) if page_size else []
+        if queryset._bulk_load_size and not queryset._as_pymongo:
+            results = queryset._get_bulk_results(sons) if sons else []
+        else:
+            results = [queryset._get_result(son) for son in sons]
+
+        token = None
+        if page_size and len(sons) == page_size:
+            values = [self._get_son_value(sons[-1], key) for key in keys]
+            token = self._encode_page_token(ordering, values)
+        return results, token
+
+    @classmethod
+    def _merge_queries(cls, query, other):
+        """Return a new PyMongo query matching both `query` and `other`.
+        """
+        if set(query).intersection(other):
+            return {'$and': [query, other]}
+        return dict(query, **other)
+
+    @classmethod
+    def _get_keyset_query(cls, ordering, values):
+        """Build the query matching the documents that sort after the given
+        values of the ordering keys.
+        """
+        clauses = []
+        for i, (key, direction) in enumerate(ordering):
+            clause = dict((prev_key, value) for (prev_key, _), value
+                          in zip(ordering[:i], values[:i]))
+            op = '$gt' if direction == pymongo.ASCENDING else '$lt'
+            clause[key] = {op: values[i]}
+            clauses.append(clause)
+        if len(clauses) == 1:
+            return clauses[0]
+        return {'$or': clauses}
+
+    @classmethod
+    def _get_son_value(cls, son, key):
+        """Return the value at the dotted db path `key` of a SON, ``None``
+        if it is missing.
+        """
+        for part in key.split('.'):
+            if not isinstance(son, dict):
+                return None
+            son = son.get(part)
+        return son
+
+    @classmethod
+    def _encode_page_token(cls, ordering, values):
+        data = BSON.encode({'o': [list(key) for key in ordering],
+                            'v': values})
+        return base64.urlsafe_b64encode(data)
+
+    @classmethod
+    def _decode_page_token(cls, token, ordering):
+        try:
+            data = BSON(base64.urlsafe_b64decode(str(token))).decode()
+        except Exception:
+            raise InvalidQueryError('Invalid pagination token')
+        if data.get('o') != [list(key) for key in ordering]:
+            raise InvalidQueryError('Pagination token was created with a '
+                                    'different ordering')
+        return data['v']
 
     def hint(self, index=None):
         """Added 'hint' support, telling Mongo the proper index to use for the
@@ -998,35 +1667,39 @@ class QuerySet(object):
 
         .. versionadded:: 0.5
         """
-        self._hint = index
-        return self
+        queryset = self.clone()
+        queryset._hint = index
+        return queryset
 
     def __getitem__(self, key):
         """Support skip and limit using getitem and slicing syntax.
         """
         # Slice provided
         if isinstance(key, slice):
+            queryset = self.clone()
             try:
-                self._cursor_obj = self._cursor[key]
-                self._skip, self._limit = key.start, key.stop
+                queryset._cursor_obj = queryset._cursor[key]
+                queryset._skip, queryset._limit = key.start, key.stop
             except IndexError, err:
                 # PyMongo raises an error if key.start == key.stop, catch it,
                 # bin it, kill it.
                 start = key.start or 0
                 if start >= 0 and key.stop >= 0 and key.step is None:
                     if start == key.stop:
-                        self.limit(0)
-                        self._skip, self._limit = key.start, key.stop - start
-                        return self
+                        queryset._skip, queryset._limit = key.start, 0
+                        return queryset
                 raise err
             # Allow further QuerySet modifications to be performed
-            return self
+            return queryset
         # Integer index provided
         elif isinstance(key, int):
-            if self._scalar:
-                return self._get_scalar(self._document._from_son(
-                        self._cursor[key]))
-            return self._document._from_son(self._cursor[key])
+            if self._use_cache:
+                if key < 0:
+                    self._fill_cache()
+                else:
+                    self._fill_cache(key + 1 - len(self._result_cache))
+                return self._result_cache[key]
+            return self._get_result(self._cursor[key])
         raise AttributeError
 
     def distinct(self, field):
@@ -1094,12 +1767,13 @@ class QuerySet(object):
             key = '.'.join(parts)
             cleaned_fields.append((key, value))
 
+        queryset = self.clone()
         fields = sorted(cleaned_fields, key=operator.itemgetter(1))
         for value, group in itertools.groupby(fields, lambda x: x[1]):
             fields = [field for field, value in group]
             fields = self._fields_to_dbfields(fields)
-            self._loaded_fields += QueryFieldList(fields, value=value)
-        return self
+            queryset._loaded_fields += QueryFieldList(fields, value=value)
+        return queryset
 
     def all_fields(self):
         """Include all fields. Reset all previously calls of .only() and .exclude(). ::
@@ -1108,8 +1782,9 @@ class QuerySet(object):
 
         .. versionadded:: 0.5
         """
-        self._loaded_fields = QueryFieldList(always_include=self._loaded_fields.always_include)
-        return self
+        queryset = self.clone()
+        queryset._loaded_fields = QueryFieldList(always_include=self._loaded_fields.always_include)
+        return queryset
 
     def _fields_to_dbfields(self, fields):
         """Translate fields paths to its db equivalents"""
@@ -1127,6 +1802,13 @@ class QuerySet(object):
         :param keys: fields to order the query results by; keys may be
             prefixed with **+** or **-** to determine the ordering direction
         """
+        queryset = self.clone()
+        queryset._ordering = self._get_order_by(keys)
+        return queryset
+
+    def _get_order_by(self, keys):
+        """Translate order keys to a PyMongo sort specification.
+        """
         key_list = []
         for key in keys:
             if not key: continue
@@ -1141,9 +1823,7 @@ class QuerySet(object):
             except:
                 pass
             key_list.append((key, direction))
-
-        self._ordering = key_list
-        return self
+        return key_list
 
     def explain(self, format=False):
         """Return an explain plan record for the
@@ -1157,13 +1837,55 @@ class QuerySet(object):
             plan = pprint.pformat(plan)
         return plan
 
+    def bulk_load(self, batch_size=100):
+        """Load the documents in batches of `batch_size`.  Rather than a
+        ``pre_init`` and ``post_init`` signal for every document,
+        ``pre_bulk_load`` is sent with the batch's raw SONs (``sons``) and
+        ``post_bulk_load`` with the loaded documents (``documents``).
+        Documents that can only be built through their constructor (dynamic
+        documents or classes overriding ``__init__``) still send their init
+        signals.
+
+        :param batch_size: the number of documents per batch, ``None`` to
+            load documents one at a time again
+        """
+        queryset = self.clone()
+        queryset._bulk_load_size = batch_size
+        return queryset
+
+    def lazy(self, lazy=True):
+        """Keep the raw values of the loaded documents and only convert each
+        field the first time it is accessed.  Useful when only a few fields
+        of large documents are read.  Overrides the ``lazy_decode`` meta
+        option of the document.
+
+        :param lazy: ``False`` to convert every field as the documents are
+            loaded
+        """
+        queryset = self.clone()
+        queryset._lazy = lazy
+        return queryset
+
+    def cache(self, enabled=True):
+        """Keep the results in memory as they are read, so that iterating
+        again, ``len()``, ``bool()`` and integer indexes use them instead of
+        querying again.  Refining the queryset returns a queryset with an
+        empty cache.
+
+        :param enabled: ``False`` to query the database every time again
+        """
+        queryset = self.clone()
+        queryset._use_cache = enabled
+        return queryset
+
     def read_preference(self, read_preference):
         """Specify the read preference when querying.
 
         :param read_preference: the ReadPreference to use
         """
-        self._read_preference = read_preference
-        return self
+        queryset = self.clone()
+        queryset._read_preference = read_preference
+        return queryset
 
 
     def delete(self, w=1):
@@ -1325,6 +2047,8 @@ class QuerySet(object):
             raise OperationError(u'Update failed [%s]' % unicode(e))
 
     def __iter__(self):
+        if self._use_cache:
+            return self._iter_cache()
         self.rewind()
         return self
 
@@ -1353,19 +2077,155 @@ class QuerySet(object):
 
         :param fields: One or more fields to return instead of a Document.
         """
-        self._scalar = list(fields)
+        queryset = self.clone()
+        queryset._scalar = list(fields)
 
         if fields:
-            self.only(*fields)
+            queryset = queryset.only(*fields)
         else:
-            self.all_fields()
+            queryset = queryset.all_fields()
 
-        return self
+        return queryset
 
     def values_list(self, *fields):
         """An alias for scalar"""
         return self.scalar(*fields)
 
+    def as_pymongo(self, translate_names=False):
+        """Instead of returning Document instances, return the dictionaries
+        as they come from PyMongo.  Filters (including the inheritance
+        filter), ordering, :meth:`only` / :meth:`exclude`, limits and skips
+        still apply.  Takes precedence over :meth:`scalar`.
+
+        :param translate_names: rename the top level keys stored under a
+            ``db_field`` to the document's field names
+        """
+        queryset = self.clone()
+        queryset._as_pymongo = True
+        queryset._translate_names = translate_names
+        return queryset
+
+    def _get_as_pymongo(self, son):
+        if not self._translate_names:
+            return son
+
+        doc_cls = self._document
+        class_name = son.get('_cls')
+        if class_name and class_name != doc_cls._class_name:
+            from base import get_document
+            doc_cls = get_document(class_name)
+        field_map = doc_cls._reverse_db_field_map
+        return dict((field_map.get(key, key), value)
+                    for key, value in son.iteritems())
+
+    def to_columns(self, *fields):
+        """Return the values of `fields` as a dictionary of NumPy arrays,
+        one per field, without creating a document for each result.
+
+        :class:`~mongoengine.IntField`, :class:`~mongoengine.FloatField` and
+        :class:`~mongoengine.BooleanField` values give numeric arrays and
+        :class:`~mongoengine.DateTimeField` values ``datetime64`` arrays, any
+        other field gives an object array.  Missing values are replaced by
+        the field's default, an integer column still missing values is
+        returned as floats with ``nan`` and a boolean one as objects.
+
+        Requires NumPy.
+
+        :param fields: the fields to return, using ``__`` to separate
+            embedded field names. Defaults to all of the document's fields
+        """
+        try:
+            import numpy
+        except ImportError:
+            from fields import ImproperlyConfigured
+            raise ImproperlyConfigured("NumPy library was not found")
+
+        fields = list(fields) or self._document._fields.keys()
+        columns = []
+        for name in fields:
+            parts = QuerySet._lookup_field(self._document, name.split('__'))
+            path = [getattr(part, 'db_field', part) for part in parts]
+            columns.append((name, path, parts[-1], []))
+
+        queryset = self.only(*fields)
+        if queryset._limit != 0:
+            for son in queryset._cursor:
+                for name, path, field, values in columns:
+                    values.append(self._get_column_value(son, path, field))
+
+        return dict((name, self._to_array(field, values))
+                    for name, path, field, values in columns)
+
+    def to_dataframe(self, *fields):
+        """Return the values of `fields` as a :class:`pandas.DataFrame` with
+        a column per field, built from :meth:`to_columns`.
+
+        Requires NumPy and pandas.
+
+        :param fields: the fields to return, using ``__`` to separate
+            embedded field names. Defaults to all of the document's fields
+        """
+        try:
+            import pandas
+        except ImportError:
+            from fields import ImproperlyConfigured
+            raise ImproperlyConfigured("pandas library was not found")
+
+        fields = list(fields) or self._document._fields.keys()
+        return pandas.DataFrame(self.to_columns(*fields), columns=fields)
+
+    @classmethod
+    def _get_column_value(cls, son, path, field):
+        """Returns the Python value stored at `path` in a SON, or the
+        field's default if there isn't one.
+        """
+        value = son
+        for key in path:
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and key.isdigit():
+                index = int(key)
+                value = value[index] if index < len(value) else None
+            else:
+                value = None
+            if value is None:
+                break
+
+        if not hasattr(field, 'to_python'):
+            # A member of an untyped list or dict
+            return value
+        if value is None:
+            value = field.default
+            if callable(value):
+                value = value()
+            return value
+        return field.to_python(value)
+
+    @classmethod
+    def _to_array(cls, field, values):
+        """Builds the NumPy array for a column of values of `field`.
+        """
+        import numpy
+        from fields import IntField, FloatField, BooleanField, DateTimeField
+        if isinstance(field, (IntField, FloatField)):
+            if None in values:
+                return numpy.array([numpy.nan if v is None else v
+                                    for v in values], dtype='float64')
+            if isinstance(field, IntField):
+                return numpy.array(values, dtype='int64')
+            return numpy.array(values, dtype='float64')
+        if isinstance(field, BooleanField) and None not in values:
+            return numpy.array(values, dtype='bool')
+        if isinstance(field, DateTimeField):
+            return numpy.array(values, dtype='datetime64[ms]')
+
+        # Fill an empty array item by item so that list values aren't turned
+        # into extra dimensions
+        array = numpy.empty(len(values), dtype='object')
+        for index, value in enumerate(values):
+            array[index] = value
+        return array
+
     def _sub_js_fields(self, code):
         """When fields are specified with [~fieldname] syntax, where
         *fieldname* is the Python name of a field, *fieldname* will be
@@ -1425,7 +2285,7 @@ class QuerySet(object):
 
         query = self._query
         if self._where_clause:
-            query['$where'] = self._where_clause
+            query = dict(query, **{'$where': self._where_clause})
 
         scope['query'] = query
         code = Code(code, scope=scope)
@@ -1444,9 +2304,150 @@ class QuerySet(object):
 
         .. versionadded:: 0.5
         """
-        where_clause = self._sub_js_fields(where_clause)
-        self._where_clause = where_clause
-        return self
+        queryset = self.clone()
+        queryset._where_clause = self._sub_js_fields(where_clause)
+        return queryset
+
+    def aggregate(self, *pipeline, **kwargs):
+        """Run an aggregation pipeline on the documents of the queryset and
+        return a cursor over the resulting dictionaries. ::
+
+            Page.objects(published=True).order_by('-date').limit(100).aggregate(
+                {'$group': {'_id': '$author', 'views': {'$sum': '$stats.views'}}})
+
+        The pipeline starts with stages applying the queryset's query
+        (including the inheritance filter), ordering, skip, limit and
+        :meth:`only` / :meth:`exclude` projection.  Field names used in the
+        given stages, as keys of ``$match``, ``$sort`` and ``$project`` or
+        as ``$field`` paths, are translated to their ``db_field`` names up to
+        and including the first stage that reshapes the documents, such as
+        ``$group`` or ``$project``.
+
+        :param pipeline: the stages, or a single list of stages
+        :param kwargs: options for PyMongo's
+            :meth:`~pymongo.collection.Collection.aggregate`, for example
+            ``allowDiskUse=True`` or ``batchSize=1000``
+        """
+        if len(pipeline) == 1 and isinstance(pipeline[0], (list, tuple)):
+            pipeline = pipeline[0]
+
+        stages = []
+        translate = True
+        for stage in pipeline:
+            if translate:
+                stage = self._translate_stage(stage)
+                translate = not RESHAPING_STAGES.intersection(stage)
+            stages.append(stage)
+
+        return self._read_collection.aggregate(
+            self._get_initial_stages() + stages, **kwargs)
+
+    def _get_initial_stages(self):
+        """Return the aggregation stages selecting the documents of the
+        queryset, in its order.
+        """
+        if self._where_clause:
+            raise InvalidQueryError('Cannot use where() with aggregate()')
+        if self._limit == 0:
+            # $limit must be positive, match no documents instead
+            return [{'$match': {'_id': {'$in': []}}}]
+
+        initial = []
+        if self._query:
+            initial.append({'$match': self._query})
+        ordering = (self._ordering or
+                    self._get_order_by(self._document._meta['ordering']))
+        if ordering:
+            initial.append({'$sort': SON(ordering)})
+        if self._skip:
+            initial.append({'$skip': self._skip})
+        if self._limit is not None:
+            initial.append({'$limit': self._limit})
+        if self._loaded_fields:
+            initial.append({'$project': self._loaded_fields.as_dict()})
+        return initial
+
+    def _translate_stage(self, stage):
+        """Return a copy of an aggregation stage with the field names of the
+        document translated to db field names.
+        """
+        translated = {}
+        for name, spec in stage.items():
+            if name == '$match':
+                spec = self._translate_match(spec)
+            elif name == '$sort':
+                spec = SON((self._translate_path(key), value)
+                           for key, value in spec.items())
+            elif name == '$project':
+                spec = SON((self._translate_path(key), value)
+                           if value in (0, 1, True, False)
+                           else (key, self._translate_expression(value))
+                           for key, value in spec.items())
+            elif name == '$lookup' and 'localField' in spec:
+                spec = dict(spec, localField=self._translate_path(
+                    spec['localField']))
+            elif name in ('$group', '$unwind', '$addFields', '$sortByCount',
+                          '$bucket', '$bucketAuto', '$replaceRoot'):
+                spec = self._translate_expression(spec)
+            translated[name] = spec
+        return translated
+
+    def _translate_match(self, query):
+        """Translate the field names of a raw PyMongo query.
+        """
+        translated = SON()
+        for key, value in query.items():
+            if key in ('$and', '$or', '$nor'):
+                value = [self._translate_match(clause) for clause in value]
+            translated[self._translate_path(key)] = value
+        return translated
+
+    def _translate_expression(self, expression):
+        """Translate the ``$field`` paths of an aggregation expression.
+        """
+        if isinstance(expression, basestring):
+            if expression.startswith('$') and not expression.startswith('$$'):
+                return '$' + self._translate_path(expression[1:])
+            return expression
+        if isinstance(expression, dict):
+            return SON((key, self._translate_expression(value))
+                       for key, value in expression.items())
+        if isinstance(expression, (list, tuple)):
+            return [self._translate_expression(value) for value in expression]
+        return expression
+
+    def _translate_path(self, path):
+        """Translate a dotted field name to its db field path, leaving
+        names that are not fields of the document as they are.
+        """
+        if path.startswith('$'):
+            return path
+        try:
+            fields = QuerySet._lookup_field(self._document, path.split('.'))
+        except InvalidQueryError:
+            return path
+        return '.'.join(getattr(field, 'db_field', field) for field in fields)
+
+    def _aggregate_query(self, *pipeline):
+        """Run the aggregation `pipeline` on the documents matched by the
+        query and return the list of results.  ``$where`` can't be used in
+        a pipeline, so with a where clause this raises
+        :class:`~pymongo.errors.OperationFailure` for the callers to fall back
+        to JavaScript.
+        """
+        if self._where_clause:
+            raise pymongo.errors.OperationFailure(
+                'where() is not supported by the aggregation framework')
+        pipeline = list(pipeline)
+        query = self._query
+        if query:
+            pipeline.insert(0, {'$match': query})
+        return list(self._read_collection.aggregate(pipeline))
+
+    def _get_field_path(self, field):
+        """Return the aggregation expression of a (dotted) field name.
+        """
+        return '$' + QuerySet._translate_field_name(self._document, field)
 
     def sum(self, field):
         """Sum over the values of the specified field.
@@ -1456,7 +2457,19 @@ class QuerySet(object):
 
         .. versionchanged:: 0.5 - updated to map_reduce as db.eval doesnt work
             with sharding.
+        .. versionchanged:: 0.6.X - uses the aggregation framework, falls back
+            to map_reduce on servers without it or with :meth:`where`
         """
+        try:
+            results = self._aggregate_query({'$group': {
+                '_id': None, 'total': {'$sum': self._get_field_path(field)}}})
+        except pymongo.errors.OperationFailure:
+            return self._sum_map_reduce(field)
+        for result in results:
+            return result['total']
+        return 0
+
+    def _sum_map_reduce(self, field):
         map_func = Code("""
             function() {
                 emit(1, this[field] || 0);
@@ -1486,7 +2499,19 @@ class QuerySet(object):
 
         .. versionchanged:: 0.5 - updated to map_reduce as db.eval doesnt work
             with sharding.
+        .. versionchanged:: 0.6.X - uses the aggregation framework, falls back
+            to map_reduce on servers without it or with :meth:`where`
         """
+        try:
+            results = self._aggregate_query({'$group': {
+                '_id': None, 'average': {'$avg': self._get_field_path(field)}}})
+        except pymongo.errors.OperationFailure:
+            return self._average_map_reduce(field)
+        for result in results:
+            return result['average'] or 0
+        return 0
+
+    def _average_map_reduce(self, field):
         map_func = Code("""
             function() {
                 if (this.hasOwnProperty(field))
@@ -1534,15 +2559,46 @@ class QuerySet(object):
 
         :param field: the field to use
         :param normalize: normalize the results so they add to 1.0
-        :param map_reduce: Use map_reduce over exec_js
+        :param map_reduce: on servers without the aggregation framework, use
+            map_reduce rather than exec_js
 
         .. versionchanged:: 0.5 defaults to map_reduce and can handle embedded
                             document lookups
+        .. versionchanged:: 0.6.X uses the aggregation framework, unless
+                            :meth:`where` is used
         """
+        try:
+            return self._item_frequencies_aggregate(field, normalize=normalize)
+        except pymongo.errors.OperationFailure:
+            pass
         if map_reduce:
             return self._item_frequencies_map_reduce(field, normalize=normalize)
         return self._item_frequencies_exec_js(field, normalize=normalize)
 
+    def _item_frequencies_aggregate(self, field, normalize=False):
+        path = self._get_field_path(field)
+        # Missing and null values are counted under None, like the
+        # Javascript versions do, items of lists are counted one by one
+        results = self._aggregate_query(
+            {'$project': {'item': {'$ifNull': [path, [None]]}}},
+            {'$unwind': '$item'},
+            {'$group': {'_id': '$item', 'count': {'$sum': 1}}})
+        frequencies = {}
+        for result in results:
+            key = result['_id']
+            # Numbers are returned as strings, as Javascript object keys are
+            if isinstance(key, (int, long, float)) and not isinstance(key, bool):
+                if int(key) == key:
+                    key = int(key)
+                key = str(key)
+            frequencies[key] = frequencies.get(key, 0) + result['count']
+
+        if normalize:
+            count = float(sum(frequencies.values()))
+            frequencies = dict((k, v / count) for k, v in frequencies.items())
+
+        return frequencies
+
     def _item_frequencies_map_reduce(self, field, normalize=False):
         map_func = """
             function() {
@@ -1664,17 +2720,45 @@ class QuerySet(object):
             data[-1] = "...(remaining elements truncated)..."
         return repr(data)
 
-    def select_related(self, max_depth=1):
+    def select_related(self, max_depth=1, strategy='dereference'):
         """Handles dereferencing of :class:`~bson.dbref.DBRef` objects to
         a maximum depth in order to cut down the number queries to mongodb.
 
+        :param max_depth: the number of levels of references to follow
+        :param strategy: ``'dereference'`` to query each referenced
+            collection once the documents are loaded, or ``'lookup'`` to
+            load them in the same query, see :meth:`join`
+
         .. versionadded:: 0.5
+        .. versionchanged:: 0.6.X - added `strategy`
         """
+        if strategy == 'lookup':
+            from dereference import LookupJoin
+            paths = LookupJoin.get_reference_paths(self._document, max_depth)
+            return LookupJoin()(self, paths)
+        if strategy != 'dereference':
+            raise ValueError('Unknown select_related strategy: %s' % strategy)
+
         from dereference import DeReference
         # Make select related work the same for querysets
         max_depth += 1
         return DeReference()(self, max_depth=max_depth)
 
+    def join(self, *fields):
+        """Return a list of the documents with the documents referenced by
+        `fields` loaded in the same query, by an aggregation joining each
+        referenced collection with ``$lookup`` (MongoDB 3.6 or later).
+        Fields are :class:`~mongoengine.ReferenceField`\ s or lists of them,
+        use dot-notation to follow references of referenced documents::
+
+            posts = Post.objects.order_by('-date')[:20].join(
+                'author', 'comments', 'comments.author')
+
+        :param fields: the reference fields to load
+        """
+        from dereference import LookupJoin
+        return LookupJoin()(self, fields)
+
 
 class QuerySetManager(object):
 
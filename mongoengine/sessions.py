@@ -0,0 +1,261 @@
+import threading
+
+import pymongo
+
+from mongoengine import signals
+from base import ValidationError
+from connection import DEFAULT_DB_ALIAS
+from queryset import QuerySet, OperationError, BulkSaveError
+
+__all__ = ['Session', 'session']
+
+
+_local = threading.local()
+
+
+def active_session():
+    """Returns the innermost :class:`Session` open in the current thread, or
+    ``None`` if there isn't one.
+    """
+    sessions = getattr(_local, 'sessions', None)
+    if sessions:
+        return sessions[-1]
+    return None
+
+
+class Session(object):
+    """A unit of work.  While a session is open, calls to
+    :meth:`~mongoengine.Document.save`, :meth:`~mongoengine.Document.delete`
+    and :meth:`~mongoengine.Document.update` are recorded rather than sent to
+    the database, and :meth:`flush` sends them as bulk writes, one set per
+    collection.  Saving the same document several times only saves it once,
+    with all its changes, and cascades to its references once the writes are
+    sent.  Saves send the `pre_bulk_save` and `post_bulk_save` signals of each
+    collection, not `pre_save` and `post_save`.
+
+    Use it as a context manager, the writes are flushed when the block exits
+    and dropped if it raises::
+
+        with session():
+            post.title = 'Title'
+            post.save()
+            author.update(inc__posts=1)
+            post.save()
+
+    :param ordered: send each collection's writes in order and stop at the
+        first that fails
+    :param batch_size: the number of writes sent in each bulk operation
+    :param validate: validate the documents before saving them
+    :param write_options: extra keyword arguments used as the write concern
+        of the bulk writes
+    """
+
+    def __init__(self, ordered=True, batch_size=1000, validate=True,
+                 write_options=None):
+        self.ordered = ordered
+        self.batch_size = batch_size
+        self.validate = validate
+        self.write_options = write_options
+        self._operations = []
+        self._saves = {}
+
+    def __enter__(self):
+        if getattr(_local, 'sessions', None) is None:
+            _local.sessions = []
+        _local.sessions.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.sessions.remove(self)
+        if exc_type is None:
+            self.flush()
+        else:
+            self.clear()
+
+    def save(self, document, validate=True, write_options=None,
+             cascade=None, cascade_kwargs=None):
+        """Records that `document` is to be saved, with the arguments of
+        :meth:`~mongoengine.Document.save`.  A document saved again is saved
+        once, in the place and with the arguments of its last save.
+        `write_options` can't be given, the session's are used for all the
+        writes.
+        """
+        if write_options:
+            raise OperationError('Cannot set write_options of a save inside '
+                                 'a session, set those of the session')
+        options = {'validate': validate, 'cascade': cascade,
+                   'cascade_kwargs': cascade_kwargs}
+        # Drop an earlier save, the document is written with all its
+        # changes after the writes recorded since
+        position = self._saves.get(id(document))
+        if position is not None:
+            self._operations[position] = None
+        self._saves[id(document)] = len(self._operations)
+        self._operations.append(('save', document, options))
+
+    def delete(self, document):
+        """Records that `document` is to be deleted, dropping a save of it
+        still to be sent.
+        """
+        position = self._saves.pop(id(document), None)
+        if position is not None:
+            self._operations[position] = None
+        if document.pk is not None:
+            self._operations.append(('delete', document, None))
+
+    def update(self, document, query, update):
+        """Records an update of `document`, selected by the raw `query`, with
+        Django-style `update` keyword arguments.
+        """
+        if not update:
+            raise OperationError("No update parameters, would remove data")
+        update = QuerySet._transform_update(document.__class__, **update)
+        self._operations.append(('update', document, (query, update)))
+
+    def clear(self):
+        """Drops the writes recorded but not yet sent.
+        """
+        self._operations = []
+        self._saves = {}
+
+    def flush(self):
+        """Sends the writes recorded so far, as bulk writes grouped by
+        collection.  Raises :class:`~mongoengine.queryset.BulkSaveError` if
+        any fail, its ``errors`` map the position of each failed write to its
+        error and ``documents`` hold the document of each write.
+        """
+        operations = self._operations
+        self.clear()
+
+        # Group the writes by database and collection, keeping their order
+        collections = []
+        positions = {}
+        for position, operation in enumerate(operations):
+            if operation is None:
+                continue
+            document = operation[1]
+            name = (document._meta.get('db_alias', DEFAULT_DB_ALIAS),
+                    document._get_collection_name())
+            if name not in positions:
+                positions[name] = []
+                collections.append(name)
+            positions[name].append(position)
+
+        errors = {}
+        saved = []
+        for name in collections:
+            self._flush_collection(operations, positions[name], errors, saved)
+        self._cascade(operations, saved, errors)
+
+        if errors:
+            documents = [operation and operation[1]
+                         for operation in operations]
+            raise BulkSaveError('Could not flush %d of %d writes' %
+                                (len(errors), len(filter(None, operations))),
+                                errors=errors, documents=documents)
+
+    def _flush_collection(self, operations, positions, errors, saved):
+        """Sends the writes of one collection, found at `positions` in
+        `operations`, adding the positions of the saves sent to `saved`.
+        """
+        document_cls = operations[positions[0]][1].__class__
+        queryset = document_cls.objects
+        saving = [operations[position][1] for position in positions
+                  if operations[position][0] == 'save']
+        if saving and signals.pre_bulk_save.receivers:
+            signals.pre_bulk_save.send(document_cls, documents=saving)
+
+        # (position, document, raw document if inserted, write request)
+        writes = []
+        rule_deletes = []
+        for position in positions:
+            kind, document, data = operations[position]
+            if kind == 'save':
+                if self.validate and data['validate']:
+                    try:
+                        document.validate()
+                    except ValidationError, err:
+                        errors[position] = err
+                        if self.ordered:
+                            break
+                        continue
+                raw, request = queryset._get_save_request(document)
+                writes.append((position, document, raw, request))
+                continue
+
+            if kind == 'update':
+                request = pymongo.UpdateOne(*data)
+            else:
+                if signals.pre_delete.receivers:
+                    signals.pre_delete.send(document.__class__,
+                                            document=document)
+                # Delete rules need the queries QuerySet.delete makes
+                if document._meta['delete_rules']:
+                    rule_deletes.append((position, document))
+                    continue
+                query = document.__class__.objects(pk=document.pk)._query
+                request = pymongo.DeleteOne(query)
+            writes.append((position, document, None, request))
+
+        saved_documents = []
+        for position, document, raw, request in queryset._bulk_write(
+                writes, errors, self.ordered, self.batch_size,
+                self.write_options):
+            kind = operations[position][0]
+            if kind == 'save':
+                document._saved(raw and raw['_id'], created=raw is not None)
+                saved_documents.append(document)
+                saved.append(position)
+            elif kind == 'delete' and signals.post_delete.receivers:
+                signals.post_delete.send(document.__class__,
+                                         document=document)
+
+        for position, document in rule_deletes:
+            if self.ordered and [p for p in positions if p in errors]:
+                break
+            try:
+                document.__class__.objects(pk=document.pk).delete()
+            except OperationError, err:
+                errors[position] = err
+                continue
+            if signals.post_delete.receivers:
+                signals.post_delete.send(document.__class__,
+                                         document=document)
+
+        if saving and signals.post_bulk_save.receivers:
+            signals.post_bulk_save.send(document_cls, documents=saved_documents)
+
+    def _cascade(self, operations, positions, errors):
+        """Saves the changed references of the documents saved at
+        `positions` in `operations`, as :meth:`~mongoengine.Document.save`
+        does.  Documents saved by the session are not saved again.
+        """
+        refs = set(id(operations[position][1]) for position in positions)
+        for position in positions:
+            kind, document, options = operations[position]
+            cascade = options['cascade']
+            if cascade is None:
+                cascade = document._meta.get('cascade', True)
+            if not cascade:
+                continue
+            kwargs = {'validate': self.validate and options['validate'],
+                      'write_options': self.write_options}
+            if options['cascade_kwargs']:
+                kwargs.update(options['cascade_kwargs'])
+            kwargs['_refs'] = refs
+            try:
+                document.cascade_save(**kwargs)
+            except (ValidationError, OperationError), err:
+                errors[position] = err
+
+
+def session(**kwargs):
+    """Opens a :class:`Session` recording the writes made to documents until
+    it is flushed::
+
+        with mongoengine.session():
+            ...
+
+    Keyword arguments are passed on to :class:`Session`.
+    """
+    return Session(**kwargs)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 __all__ = ['pre_init', 'post_init', 'pre_save', 'post_save',
-           'pre_delete', 'post_delete']
+           'pre_delete', 'post_delete', 'pre_bulk_insert', 'post_bulk_insert',
+           'pre_bulk_load', 'post_bulk_load', 'pre_bulk_save', 'post_bulk_save']
 
 signals_available = False
 try:
@@ -16,9 +17,12 @@ except ImportError:
         """If blinker is unavailable, create a fake class with the same
         interface that allows sending of signals but will fail with an
         error on anything else.  Instead of doing anything on send, it
-        will just ignore the arguments and do nothing instead.
+        will just ignore the arguments and do nothing instead.  Like blinker
+        signals it has a ``receivers`` mapping, which is always empty.
         """
 
+        receivers = {}
+
         def __init__(self, name, doc=None):
             self.name = name
             self.__doc__ = doc
@@ -32,6 +36,12 @@ except ImportError:
             temporarily_connected_to = _fail
         del _fail
 
+# Sending a signal builds its keyword arguments even if nothing is listening,
+# so on hot paths check the signal's ``receivers`` first:
+#
+#     if signals.post_init.receivers:
+#         signals.post_init.send(...)
+#
 # the namespace for code signals.  If you are not mongoengine code, do
 # not put signals in here.  Create your own namespace instead.
 _signals = Namespace()
@@ -44,3 +54,7 @@ pre_delete = _signals.signal('pre_delete')
 post_delete = _signals.signal('post_delete')
 pre_bulk_insert = _signals.signal('pre_bulk_insert')
 post_bulk_insert = _signals.signal('post_bulk_insert')
+pre_bulk_load = _signals.signal('pre_bulk_load')
+post_bulk_load = _signals.signal('post_bulk_load')
+pre_bulk_save = _signals.signal('pre_bulk_save')
+post_bulk_save = _signals.signal('post_bulk_save')
@@ -0,0 +1,154 @@
+import atexit
+import os
+import threading
+import time
+import warnings
+import Queue
+
+import pymongo
+from bson.objectid import ObjectId
+
+from queryset import OperationError
+
+__all__ = ['WriteBehindBuffer']
+
+
+# The number of error messages kept until the buffer is flushed
+MAX_ERRORS = 100
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+class WriteBehindBuffer(object):
+    """Holds new documents of a collection until a background thread inserts
+    them in batches, so that saving them doesn't wait on the database.  Used
+    by documents with :attr:`write_behind` set in their :attr:`meta`.
+
+    :param document_cls: the :class:`~mongoengine.Document` class whose
+        collection the documents are inserted into
+    :param max_batch: the largest number of documents inserted at once
+    :param max_delay_ms: how long a document may wait for others to fill its
+        batch before it is inserted
+    :param max_size: the number of documents the buffer holds, adding to a
+        full buffer waits until the thread has made room; defaults to ten
+        batches
+
+    A buffer belongs to the process that created it, a forked process gets
+    a new one from :func:`get_buffer` and leaves its parent's documents to
+    the parent.
+    """
+
+    def __init__(self, document_cls, max_batch=1000, max_delay_ms=50,
+                 max_size=None):
+        self.document_cls = document_cls
+        self.pid = os.getpid()
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue = Queue.Queue(max_size or max_batch * 10)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._errors = []
+        self._error_count = 0
+
+    def put(self, son):
+        """Adds the raw document `son` to the buffer, giving it an ``_id``
+        if it has none, and returns the ``_id``.  Blocks while the buffer is
+        full.
+        """
+        if son.get('_id') is None:
+            son['_id'] = ObjectId()
+        self._start()
+        self._queue.put(son)
+        return son['_id']
+
+    def flush(self):
+        """Waits until every document in the buffer has been inserted.
+        Raises :class:`~mongoengine.queryset.OperationError` if any inserts
+        failed since the last flush.
+        """
+        self._queue.join()
+        with self._lock:
+            errors, count = self._errors, self._error_count
+            self._errors, self._error_count = [], 0
+        if count:
+            raise OperationError('Could not insert %d documents (%s)' %
+                                 (count, '; '.join(errors)))
+
+    def _start(self):
+        """Starts the thread inserting the documents if it isn't running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(True, timeout))
+                except Queue.Empty:
+                    break
+            try:
+                self._insert(batch)
+            finally:
+                for son in batch:
+                    self._queue.task_done()
+
+    def _insert(self, batch):
+        errors = []
+        try:
+            collection = self.document_cls._get_collection()
+            collection.insert_many(batch, ordered=False)
+        except pymongo.errors.BulkWriteError, err:
+            errors = [error['errmsg']
+                      for error in err.details.get('writeErrors', [])]
+        except Exception, err:
+            errors = [unicode(err)] * len(batch)
+        if errors:
+            with self._lock:
+                self._error_count += len(errors)
+                room = MAX_ERRORS - len(self._errors)
+                self._errors.extend(errors[:max(room, 0)])
+
+
+def get_buffer(document_cls):
+    """Returns the :class:`WriteBehindBuffer` of `document_cls`, or ``None``
+    if its documents are written directly.
+    """
+    options = document_cls._meta.get('write_behind')
+    if not options:
+        return None
+    buffer = _buffers.get(document_cls)
+    if buffer is None or buffer.pid != os.getpid():
+        with _buffers_lock:
+            buffer = _buffers.get(document_cls)
+            if buffer is None or buffer.pid != os.getpid():
+                if options is True:
+                    options = {}
+                buffer = WriteBehindBuffer(document_cls, **options)
+                _buffers[document_cls] = buffer
+    return buffer
+
+
+def _flush_buffers():
+    for buffer in _buffers.values():
+        if buffer.pid != os.getpid():
+            # Inherited from the parent process, which inserts them
+            continue
+        try:
+            buffer.flush()
+        except OperationError, err:
+            warnings.warn('%s: %s' % (buffer.document_cls.__name__, err),
+                          RuntimeWarning)
+
+atexit.register(_flush_buffers)
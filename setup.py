@@ -49,5 +49,5 @@ setup(name='mongoengine',
       classifiers=CLASSIFIERS,
       install_requires=['pymongo==3.1'],
       test_suite='tests',
-      tests_require=['blinker', 'django>=1.3', 'pillow']
+      tests_require=['blinker', 'django>=1.3', 'pillow', 'numpy', 'pandas']
 )
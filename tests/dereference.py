@@ -1,7 +1,12 @@
+import os
+import signal
 import unittest
 
+from bson import DBRef
+
 from mongoengine import *
-from mongoengine.connection import get_db, register_db, connect
+from mongoengine.connection import (get_db, register_db, connect,
+                                    register_connection)
 from mongoengine.tests import query_counter
 
 
@@ -659,3 +664,157 @@ class FieldTest(unittest.TestCase):
         room = Room.objects.first().select_related()
         self.assertEquals(room.staffs_with_position[0]['staff'], sarah)
         self.assertEquals(room.staffs_with_position[1]['staff'], bob)
+
+    def test_join(self):
+        """Ensure that join and select_related(strategy='lookup') load the
+        referenced documents in the same query.
+        """
+        class Company(Document):
+            name = StringField()
+
+        class User(Document):
+            name = StringField()
+            company = ReferenceField(Company, db_field='c')
+
+        class Comment(Document):
+            text = StringField()
+            author = ReferenceField(User)
+
+        class Post(Document):
+            title = StringField()
+            author = ReferenceField(User, db_field='a')
+            comments = ListField(ReferenceField(Comment))
+
+        Company.drop_collection()
+        User.drop_collection()
+        Comment.drop_collection()
+        Post.drop_collection()
+
+        acme = Company.objects.create(name='Acme')
+        ross = User.objects.create(name='Ross', company=acme)
+        harry = User.objects.create(name='Harry')
+        first = Comment.objects.create(text='First', author=harry)
+        second = Comment.objects.create(text='Second', author=ross)
+        Post.objects.create(title='One', author=ross,
+                            comments=[first, second])
+        Post.objects.create(title='Two', author=harry)
+        Post.objects.create(title='Three')
+
+        posts = Post.objects.order_by('title').join(
+            'author.company', 'comments.author')
+        self.assertEqual([p.title for p in posts], ['One', 'Three', 'Two'])
+        one, three, two = posts
+
+        self.assertTrue(isinstance(one._data['author'], User))
+        self.assertTrue(isinstance(one._data['author']._data['company'],
+                                   Company))
+        self.assertEqual(one.author.company.name, 'Acme')
+        self.assertEqual([c._data['author'].name for c in one.comments],
+                         ['Harry', 'Ross'])
+        self.assertEqual(three.author, None)
+        self.assertEqual(two._data['author'].name, 'Harry')
+        self.assertEqual(two._data['author']._data['company'], None)
+
+        # Only the queryset's documents are loaded
+        posts = Post.objects(title='Two').only('title', 'author').join('author')
+        self.assertEqual(len(posts), 1)
+        self.assertEqual(posts[0]._data['author'].name, 'Harry')
+        self.assertEqual(posts[0].comments, [])
+
+        posts = Post.objects.order_by('title').select_related(
+            strategy='lookup')
+        self.assertTrue(isinstance(posts[0]._data['author'], User))
+        self.assertTrue(isinstance(posts[0]._data['comments'][0], Comment))
+        self.assertTrue(isinstance(
+            posts[0]._data['author']._data['company'], DBRef))
+
+        self.assertRaises(InvalidQueryError, Post.objects.join, 'title')
+        self.assertRaises(ValueError, Post.objects.select_related,
+                          strategy='unknown')
+
+        Company.drop_collection()
+        User.drop_collection()
+        Comment.drop_collection()
+        Post.drop_collection()
+
+    def _dereference_documents(self):
+        """Returns documents referencing two collections, stored through a
+        connection fetching references on a pool of 4 threads.
+        """
+        register_connection('dereference', dereference_workers=4)
+        register_db('mongoenginetest', 'dereference', 'dereference')
+
+        class User(Document):
+            name = StringField()
+            meta = {'db_alias': 'dereference'}
+
+        class Team(Document):
+            name = StringField()
+            meta = {'db_alias': 'dereference'}
+
+        class Group(Document):
+            members = ListField(ReferenceField(User))
+            teams = ListField(ReferenceField(Team))
+            refs = ListField(GenericReferenceField())
+            meta = {'db_alias': 'dereference'}
+
+        User.drop_collection()
+        Team.drop_collection()
+        Group.drop_collection()
+        return User, Team, Group
+
+    def test_fetch_collections_concurrently(self):
+        """Ensure that references to several collections, and large sets of
+        references, are all dereferenced.
+        """
+        import mongoengine.dereference
+        User, Team, Group = self._dereference_documents()
+
+        users = [User.objects.create(name='user %d' % i) for i in xrange(5)]
+        teams = [Team.objects.create(name='team %d' % i) for i in xrange(3)]
+        Group(members=users + users[:2], teams=teams,
+              refs=[users[0], teams[0]]).save()
+
+        chunk_size = mongoengine.dereference.FETCH_CHUNK_SIZE
+        mongoengine.dereference.FETCH_CHUNK_SIZE = 2
+        try:
+            group = Group.objects.select_related()[0]
+        finally:
+            mongoengine.dereference.FETCH_CHUNK_SIZE = chunk_size
+
+        self.assertEqual([u.name for u in group._data['members']],
+                         ['user %d' % i for i in range(5) + range(2)])
+        self.assertEqual([t.name for t in group._data['teams']],
+                         ['team 0', 'team 1', 'team 2'])
+        self.assertEqual(group.refs, [users[0], teams[0]])
+
+        User.drop_collection()
+        Team.drop_collection()
+        Group.drop_collection()
+
+    def test_fetch_after_fork(self):
+        """Ensure that a forked process fetches references on its own pool
+        rather than the one of its parent.
+        """
+        User, Team, Group = self._dereference_documents()
+
+        user = User.objects.create(name='Ross')
+        team = Team.objects.create(name='Red')
+        Group(members=[user], teams=[team]).save()
+        Group.objects.select_related()
+
+        pid = os.fork()
+        if not pid:
+            status = 1
+            try:
+                signal.alarm(10)
+                group = Group.objects.select_related()[0]
+                if group._data['members'][0].name == 'Ross':
+                    status = 0
+            finally:
+                os._exit(status)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+        User.drop_collection()
+        Team.drop_collection()
+        Group.drop_collection()
@@ -1,4 +1,6 @@
+import os
 import pickle
+import signal
 import pymongo
 import bson
 import unittest
@@ -9,9 +11,10 @@ from datetime import datetime
 from fixtures import Base, Mixin, PickleEmbedded, PickleTest
 
 from mongoengine import *
-from mongoengine.base import NotRegistered, InvalidDocumentError
+from mongoengine.base import NotRegistered, InvalidDocumentError, BaseList
 from mongoengine.queryset import InvalidQueryError
 from mongoengine.connection import get_db, register_db
+from mongoengine.tests import query_counter
 
 
 class DocumentTest(unittest.TestCase):
@@ -648,6 +651,29 @@ class DocumentTest(unittest.TestCase):
         self.assertEqual(person.name, "Mr Test User")
         self.assertEqual(person.age, 21)
 
+    def test_reload_returns_document(self):
+        """Ensure that reload returns the document, with changes to its
+        embedded documents tracked.
+        """
+        class Embedded(EmbeddedDocument):
+            name = StringField()
+
+        class Doc(Document):
+            embedded = EmbeddedDocumentField(Embedded)
+
+        Doc.drop_collection()
+        doc = Doc(embedded=Embedded(name='a'))
+        doc.save()
+
+        reloaded = doc.reload()
+        self.assertTrue(reloaded is doc)
+        reloaded.embedded.name = 'b'
+        self.assertEqual(reloaded._get_changed_fields(), ['embedded.name'])
+        reloaded.save()
+        self.assertEqual(Doc.objects.first().embedded.name, 'b')
+
+        Doc.drop_collection()
+
     def test_reload_referencing(self):
         """Ensures reloading updates weakrefs correctly
         """
@@ -738,6 +764,49 @@ class DocumentTest(unittest.TestCase):
         comment.date = datetime.now()
         comment.validate()
 
+    def test_validate_changed_only(self):
+        """Ensure existing documents can be validated by their changed values
+        and required fields alone.
+        """
+        class Comment(EmbeddedDocument):
+            votes = IntField(min_value=0)
+
+        class Post(Document):
+            title = StringField(required=True)
+            status = StringField(choices=('draft', 'published'))
+            rating = IntField(min_value=0)
+            comments = ListField(EmbeddedDocumentField(Comment))
+            meta = {'validate_changed_only': True}
+
+        post = Post._from_son({'_id': bson.ObjectId(), 'title': 'Test',
+                               'rating': -1,
+                               'comments': [{'votes': 1}, {'votes': -1}]})
+        post.validate()
+        self.assertRaises(ValidationError, post.validate, changed_only=False)
+
+        post.comments[0].votes = -2
+        try:
+            post.validate()
+            self.fail('ValidationError not raised')
+        except ValidationError, error:
+            self.assertEqual(error.errors.keys(), ['comments.0.votes'])
+
+        post.comments[0].votes = 2
+        post.status = 'archived'
+        self.assertRaises(ValidationError, post.validate)
+
+        post.status = 'draft'
+        post.validate()
+        post.title = None
+        try:
+            post.validate()
+            self.fail('ValidationError not raised')
+        except ValidationError, error:
+            self.assertEqual(error.errors.keys(), ['title'])
+
+        # New documents are validated in full
+        self.assertRaises(ValidationError, Post(title='Test', rating=-1).validate)
+
     def test_save(self):
         """Ensure that a document may be saved in the database.
         """
@@ -904,6 +973,43 @@ class DocumentTest(unittest.TestCase):
         p1.reload()
         self.assertEquals(p1.name, p.parent.name)
 
+    def test_save_cascades_changed_references(self):
+        """Ensure cascading saves follow cycles once and only save the
+        references that changed.
+        """
+        class Person(Document):
+            name = StringField()
+            parent = ReferenceField('self')
+            friend = ReferenceField('self')
+
+        Person.drop_collection()
+
+        p1 = Person(name="Wilson Snr")
+        p1.save()
+        p2 = Person(name="Wilson Jr", parent=p1)
+        p2.save()
+        p3 = Person(name="Wilson III", parent=p2)
+        p3.save()
+        p1.friend = p3
+        p1.save()
+
+        p3 = Person.objects.get(name="Wilson III")
+        p1 = p3.parent.parent
+        self.assertEqual(p1.friend.name, "Wilson III")
+        with query_counter() as q:
+            p3.save()
+            self.assertEqual(q, 0)
+
+        p1.name = "Daddy Wilson"
+        p1.friend.name = "Wilson 3rd"
+        p3.save()
+        self.assertEqual(p1._get_changed_fields(), [])
+        self.assertEqual(p1.friend._get_changed_fields(), [])
+
+        p1.reload()
+        self.assertEqual(p1.name, "Daddy Wilson")
+        self.assertEqual(Person.objects.get(pk=p3.pk).name, "Wilson 3rd")
+
     def test_update(self):
         """Ensure that an existing document is updated instead of be overwritten.
         """
@@ -1534,6 +1640,103 @@ class DocumentTest(unittest.TestCase):
         self.assertEquals(person.age, 21)
         self.assertEquals(person.active, False)
 
+    def test_save_refresh(self):
+        """Ensure sets and unsets are saved together and refresh reloads the
+        stored document.
+        """
+        person = self.Person(name='Test User', age=30)
+        person.save()
+        person.reload()
+
+        # Changed elsewhere
+        self.Person.objects(pk=person.pk).update_one(set__name='User')
+
+        person.age = None
+        person.save(refresh=True)
+        self.assertEqual(person.name, 'User')
+        self.assertEqual(person.age, None)
+        self.assertEqual(person._get_changed_fields(), [])
+
+        raw = self.Person._get_collection().find_one({'_id': person.pk})
+        self.assertFalse('age' in raw)
+
+        person.name = 'Test User'
+        person.age = 40
+        person.save()
+        person.reload()
+        self.assertEqual(person.name, 'Test User')
+        self.assertEqual(person.age, 40)
+
+        # Legacy write options
+        person.age = 50
+        person.save(refresh=True, write_options={'safe': True})
+        self.assertEqual(person.age, 50)
+        person.age = 60
+        person.save(write_options={'safe': True})
+        person.reload()
+        self.assertEqual(person.age, 60)
+        self.Person(name='Safe User').save(write_options={'safe': True})
+        self.assertEqual(self.Person.objects(name='Safe User').count(), 1)
+
+    def test_write_behind(self):
+        """Ensure documents with write_behind set are inserted in the
+        background and flush waits for them.
+        """
+        class Log(Document):
+            message = StringField()
+            meta = {'write_behind': {'max_batch': 10, 'max_delay_ms': 10}}
+
+        Log.drop_collection()
+        Log.objects.ensure_index({'fields': ['message'], 'unique': True})
+
+        log = Log(message='Saved')
+        log.save(force_insert=True)
+        self.assertTrue(log.pk)
+        self.assertEqual(log._get_changed_fields(), [])
+
+        logs = Log.objects.insert([Log(message=str(i)) for i in range(25)])
+        self.assertEqual(len(logs), 25)
+        self.assertTrue(all(l.pk for l in logs))
+
+        Log.flush_write_behind()
+        self.assertEqual(Log.objects.count(), 26)
+        self.assertEqual(Log.objects.get(pk=log.pk).message, 'Saved')
+
+        Log(message='Saved').save(force_insert=True)
+        self.assertRaises(OperationError, Log.flush_write_behind)
+        self.assertEqual(Log.objects.count(), 26)
+
+        Log.drop_collection()
+
+    def test_write_behind_fork(self):
+        """Ensure a forked process buffers its own documents and leaves
+        those of its parent to the parent.
+        """
+        class Entry(Document):
+            message = StringField()
+            meta = {'write_behind': {'max_batch': 100, 'max_delay_ms': 200}}
+
+        Entry.drop_collection()
+        Entry.objects.ensure_index({'fields': ['message'], 'unique': True})
+
+        Entry.objects.insert([Entry(message=str(i)) for i in range(10)])
+        pid = os.fork()
+        if not pid:
+            status = 1
+            try:
+                signal.alarm(10)
+                Entry(message='child').save(force_insert=True)
+                Entry.flush_write_behind()
+                status = 0
+            finally:
+                os._exit(status)
+        self.assertEqual(os.waitpid(pid, 0)[1], 0)
+
+        Entry.flush_write_behind()
+        self.assertEqual(Entry.objects(message__ne='child').count(), 10)
+
+        Entry.drop_collection()
+
     def test_delete(self):
         """Ensure that document may be deleted using the delete method.
         """
@@ -2279,5 +2482,168 @@ class DocumentTest(unittest.TestCase):
                                         }
                                     ) ]), "1,2")
 
+    def test_from_son(self):
+        """Ensure documents built from SON match those built by the
+        constructor.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField()
+
+        class BlogPost(Document):
+            title = StringField(db_field='t', choices=('a', 'b'))
+            comments = ListField(EmbeddedDocumentField(Comment))
+            tags = ListField(StringField())
+            meta = {'allow_inheritance': True}
+
+        class ExtendedPost(BlogPost):
+            views = IntField(default=0)
+
+        post_id = bson.ObjectId()
+        son = {'_id': post_id, '_cls': 'BlogPost.ExtendedPost', 't': 'a',
+               'comments': [{'text': 'Great'}], 'extra': 1}
+
+        post = BlogPost._from_son(son)
+        expected = ExtendedPost._from_son_init(son)
+
+        self.assertTrue(isinstance(post, ExtendedPost))
+        self.assertEqual(sorted(post._data), sorted(expected._data))
+        self.assertEqual(post._changed_fields, [])
+        self.assertFalse(post._created)
+        self.assertEqual(post.id, post_id)
+        self.assertEqual(post.title, 'a')
+        self.assertEqual(post.get_title_display(), 'a')
+        self.assertEqual(post.views, 0)
+        self.assertEqual(post.extra, 1)
+        self.assertEqual(post.comments[0].text, 'Great')
+        self.assertTrue(isinstance(post.tags, BaseList))
+        self.assertEqual(post.to_mongo(), expected.to_mongo())
+
+        post.tags.append('mongo')
+        self.assertEqual(post._changed_fields, ['tags'])
+
+    def test_from_son_lazy(self):
+        """Ensure lazily loaded documents only convert fields on access.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField()
+
+        class BlogPost(Document):
+            title = StringField()
+            comments = ListField(EmbeddedDocumentField(Comment))
+            tags = ListField(StringField())
+            meta = {'lazy_decode': True}
+
+        son = {'_id': bson.ObjectId(), 'title': 'Test',
+               'comments': [{'text': 'Great'}], 'tags': ['a']}
+
+        post = BlogPost._from_son(son)
+        self.assertEqual(post._lazy_fields,
+                         set(['title', 'comments', 'tags']))
+        self.assertEqual(post._data['comments'], [{'text': 'Great'}])
+
+        self.assertEqual(post.comments[0].text, 'Great')
+        self.assertTrue(isinstance(post.comments, BaseList))
+        self.assertEqual(post._lazy_fields, set(['title', 'tags']))
+
+        post.tags = ['b']
+        self.assertEqual(post._lazy_fields, set(['title']))
+        self.assertEqual(post._changed_fields, ['tags'])
+        data = post.to_mongo()
+        self.assertEqual(data['title'], 'Test')
+        self.assertEqual(data['tags'], ['b'])
+        self.assertEqual(post._lazy_fields, set())
+
+        post = BlogPost._from_son(son, lazy=False)
+        self.assertEqual(post._lazy_fields, frozenset())
+        self.assertTrue(isinstance(post._data['comments'][0], Comment))
+
+    def test_compiled_serializers(self):
+        """Ensure the compiled serializers match the descriptor based ones
+        and can be turned off.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField()
+
+        class BlogPost(Document):
+            title = StringField(db_field='t')
+            rating = IntField(default=3)
+            comments = ListField(EmbeddedDocumentField(Comment))
+            tags = SortedListField(StringField())
+            matrix = ListField(ListField(IntField()))
+            info = DictField()
+            meta = {'allow_inheritance': True}
+
+        class PlainPost(BlogPost):
+            meta = {'compile_serializers': False}
+
+        post = BlogPost(title='Test', comments=[Comment(text='Great')],
+                        tags=['b', 'a'], matrix=[[1, 2], [3]],
+                        info={'a': [1]})
+        post.id = bson.ObjectId()
+        self.assertNotEqual(BlogPost._get_mongo_fields(), None)
+        self.assertEqual(bson.BSON.encode(post.to_mongo()),
+                         bson.BSON.encode(post._to_mongo_descriptors()))
+        self.assertEqual(post.to_mongo()['tags'], ['a', 'b'])
+
+        self.assertEqual(PlainPost._get_mongo_fields(), None)
+        self.assertEqual(PlainPost._get_son_fields(), None)
+        post = PlainPost(title='Test', tags=['b', 'a'])
+        self.assertEqual(post.to_mongo(), {'_cls': 'BlogPost.PlainPost',
+                                           't': 'Test', 'rating': 3,
+                                           'comments': [], 'tags': ['a', 'b'],
+                                           'matrix': [], 'info': {}})
+        post = BlogPost._from_son(post.to_mongo())
+        self.assertTrue(isinstance(post, PlainPost))
+        self.assertEqual(post.tags, ['a', 'b'])
+
+    def test_dirty_tracking(self):
+        """Ensure changes to embedded documents flag the fields holding them
+        and only the changed paths end up in the delta.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField()
+            votes = IntField()
+
+        class Author(EmbeddedDocument):
+            name = StringField()
+            comment = EmbeddedDocumentField(Comment)
+
+        class BlogPost(Document):
+            title = StringField()
+            author = EmbeddedDocumentField(Author)
+            comments = ListField(EmbeddedDocumentField(Comment))
+            by_tag = MapField(EmbeddedDocumentField(Comment))
+
+        post = BlogPost._from_son({
+            '_id': bson.ObjectId(), 'title': 'Test',
+            'author': {'name': 'Ross', 'comment': {'text': 'Hi'}},
+            'comments': [{'text': 'Great'}, {'text': 'Bad', 'votes': 1}],
+            'by_tag': {'news': {'text': 'Old'}}})
+        self.assertEqual(post._get_changed_fields(), [])
+
+        post.comments[1].votes = 2
+        post.comments[1].votes = 3
+        post.author.comment.text = 'Hello'
+        post.by_tag['news'].text = 'New'
+        self.assertEqual(post._dirty_fields,
+                         set(['comments', 'author', 'by_tag']))
+        self.assertEqual(post.comments[1]._changed_fields, ['votes'])
+        self.assertEqual(post._delta(), ({'comments.1.votes': 3,
+                                          'author.comment.text': 'Hello',
+                                          'by_tag.news.text': 'New'}, {}))
+
+        post._clear_changed_fields()
+        self.assertEqual(post._get_changed_fields(), [])
+        self.assertEqual(post.comments[1]._changed_fields, [])
+
+        # Newly assigned documents pass their changes on once cleared
+        comment = Comment(text='First')
+        post.comments = [comment]
+        self.assertEqual(post._delta(), ({'comments': [
+            {'_cls': 'Comment', 'text': 'First'}]}, {}))
+        post._clear_changed_fields()
+        comment.text = None
+        self.assertEqual(post._delta(), ({}, {'comments.0.text': 1}))
+
 if __name__ == '__main__':
     unittest.main()
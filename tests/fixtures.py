@@ -15,6 +15,11 @@ class PickleTest(Document):
     photo = FileField()
 
 
+class PickleFilm(Document):
+    title = StringField()
+    year = IntField()
+
+
 class Mixin(object):
     name = StringField()
 
@@ -10,6 +10,7 @@ from mongoengine.queryset import (QuerySet, QuerySetManager,
 from mongoengine import *
 from mongoengine.connection import get_connection, register_db
 from mongoengine.tests import query_counter
+from fixtures import PickleFilm
 
 
 class QuerySetTest(unittest.TestCase):
@@ -49,6 +50,71 @@ class QuerySetTest(unittest.TestCase):
         self.assertEqual(QuerySet._transform_query(name__exists=True),
                          {'name': {'$exists': True}})
 
+    def test_transform_query_plans(self):
+        """Ensure query keys are resolved once and their values prepared on
+        each query.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField(db_field='t')
+
+        class Post(Document):
+            comments = ListField(EmbeddedDocumentField(Comment), db_field='c')
+            rating = IntField(db_field='r')
+
+        query = QuerySet._transform_query(Post, comments__0__text__ne='a',
+                                          rating__in=['1', 2])
+        self.assertEqual(query, {'c.0.t': {'$ne': 'a'}, 'r': {'$in': [1, 2]}})
+        self.assertEqual(QuerySet._get_query_plan(Post, 'rating__in'),
+                         ('r', 'in', False, Post._fields['rating']))
+
+        query = QuerySet._transform_query(Post, comments__0__text__ne='b',
+                                          rating__in=['3'])
+        self.assertEqual(query, {'c.0.t': {'$ne': 'b'}, 'r': {'$in': [3]}})
+
+    def test_lookup_field_cache(self):
+        """Ensure field paths are resolved once, except undeclared fields of
+        dynamic documents.
+        """
+        class Comment(EmbeddedDocument):
+            text = StringField(db_field='t')
+
+        class Post(DynamicDocument):
+            comments = ListField(EmbeddedDocumentField(Comment), db_field='c')
+
+        fields = QuerySet._lookup_field(Post, ['comments', '0', 'text'])
+        self.assertEqual(fields, [Post._fields['comments'], '0',
+                                  Comment._fields['text']])
+        fields.pop()
+        self.assertEqual(QuerySet._translate_field_name(Post, 'comments.text'),
+                         'c.t')
+
+        first = QuerySet._lookup_field(Post, ['tags'])[0]
+        second = QuerySet._lookup_field(Post, ['tags'])[0]
+        self.assertEqual(first.db_field, 'tags')
+        self.assertFalse(first is second)
+
+    def test_class_query(self):
+        """Ensure the _cls filter matches subclasses, is an equality match
+        without them and is updated when a subclass is defined.
+        """
+        class Animal(Document):
+            meta = {'allow_inheritance': True}
+
+        self.assertEqual(Animal.objects._query, {'_cls': 'Animal'})
+
+        class Fish(Animal):
+            pass
+
+        self.assertEqual(Animal.objects._query,
+                         {'_cls': {'$in': ['Animal.Fish', 'Animal']}})
+        self.assertEqual(Fish.objects._query, {'_cls': 'Animal.Fish'})
+
+        class Guppy(Fish):
+            pass
+
+        self.assertEqual(Fish.objects._query,
+                         {'_cls': {'$in': ['Animal.Fish.Guppy', 'Animal.Fish']}})
+
     def test_find(self):
         """Ensure that a query returns a valid set of results.
         """
@@ -514,9 +580,12 @@ class QuerySetTest(unittest.TestCase):
 
             Blog.objects.insert(blogs, load_bulk=False)
             self.assertEqual(q, 1) # 1 for the insert
+            self.assertTrue(all(blog.pk for blog in blogs))
 
-            Blog.objects.insert(blogs)
-            self.assertEqual(q, 3) # 1 for insert, and 1 for in bulk fetch (3 in total)
+            blogs = [Blog(title=blog.title, posts=blog.posts)
+                     for blog in blogs]
+            Blog.objects.insert(blogs, batch_size=50)
+            self.assertEqual(q, 3) # 2 batches, the documents aren't fetched
 
         Blog.drop_collection()
 
@@ -563,6 +632,93 @@ class QuerySetTest(unittest.TestCase):
         blog1 = Blog(title="code", posts=[post1, post2])
         obj_id = Blog.objects.insert(blog1, load_bulk=False)
         self.assertEquals(obj_id.__class__.__name__, 'ObjectId')
+        self.assertEqual(blog1.pk, obj_id)
+
+    def test_bulk_insert_errors(self):
+        """Ensure failed inserts are reported for each document.
+        """
+        class Blog(Document):
+            title = StringField()
+
+        Blog.drop_collection()
+        Blog.objects.ensure_index({'fields': ['title'], 'unique': True})
+
+        Blog.objects.insert(Blog(title='code'))
+        blogs = [Blog(title='mongodb'), Blog(title='code'), Blog(title='tips')]
+        try:
+            Blog.objects.insert(blogs)
+            self.fail('BulkSaveError not raised')
+        except BulkSaveError, error:
+            self.assertEqual(error.errors.keys(), [1])
+        self.assertTrue(blogs[0].pk)
+        self.assertEqual(blogs[2].pk, None)
+        self.assertEqual(Blog.objects.count(), 2)
+
+        blogs = [Blog(title='python'), Blog(title='code'), Blog(title='java')]
+        try:
+            Blog.objects.insert(blogs, ordered=False, batch_size=2)
+            self.fail('BulkSaveError not raised')
+        except BulkSaveError, error:
+            self.assertEqual(error.errors.keys(), [1])
+            self.assertEqual(error.documents[1], blogs[1])
+        self.assertTrue(blogs[2].pk)
+        self.assertEqual(Blog.objects.count(), 4)
+
+        Blog.drop_collection()
+
+    def test_bulk_save(self):
+        """Ensure new and existing documents can be saved in bulk.
+        """
+        class Blog(Document):
+            title = StringField()
+            rating = IntField(min_value=0)
+
+        Blog.drop_collection()
+        Blog.objects.ensure_index({'fields': ['title'], 'unique': True})
+
+        existing = Blog(title='existing', rating=1)
+        existing.save()
+        existing.reload()
+        existing.rating = None
+
+        blogs = [Blog(title='post %s' % i) for i in xrange(5)]
+        saved = Blog.objects.bulk_save(blogs + [existing], batch_size=2)
+        self.assertEqual(saved, blogs + [existing])
+        self.assertEqual(Blog.objects.count(), 6)
+        self.assertTrue(all(blog.pk for blog in blogs))
+        self.assertEqual(Blog.objects.get(title='post 3').pk, blogs[3].pk)
+        self.assertEqual(Blog.objects.get(title='existing').rating, None)
+        self.assertEqual(existing._get_changed_fields(), [])
+
+        # Errors are reported per document, the others are still saved
+        blogs[0].rating = 5
+        duplicate = Blog(title='post 1')
+        invalid = Blog(title='invalid', rating=-1)
+        new = Blog(title='new')
+        try:
+            Blog.objects.bulk_save([blogs[0], duplicate, invalid, new])
+            self.fail('BulkSaveError not raised')
+        except BulkSaveError, error:
+            self.assertEqual(sorted(error.errors.keys()), [1, 2])
+            self.assertTrue(isinstance(error.errors[2], ValidationError))
+        self.assertEqual(Blog.objects.get(title='post 0').rating, 5)
+        self.assertEqual(Blog.objects.filter(title='new').count(), 1)
+
+        # Ordered saves stop at the first failure
+        first, second = Blog(title='first'), Blog(title='second')
+        try:
+            Blog.objects.bulk_save([first, Blog(title='post 2'), second],
+                                   ordered=True)
+            self.fail('BulkSaveError not raised')
+        except BulkSaveError, error:
+            self.assertEqual(error.errors.keys(), [1])
+        self.assertTrue(first.pk)
+        self.assertEqual(second.pk, None)
+
+        self.assertRaises(OperationError, Blog.objects.bulk_save,
+                          [self.Person(name='wrong')])
+
+        Blog.drop_collection()
 
     def test_repeated_iteration(self):
         """Ensure that QuerySet rewinds itself one iteration finishes.
@@ -760,6 +916,27 @@ class QuerySetTest(unittest.TestCase):
 
         BlogPost.drop_collection()
 
+    def test_lazy(self):
+        """Ensure that QuerySet.lazy defers converting the loaded fields.
+        """
+        class BlogPost(Document):
+            title = StringField()
+            tags = ListField(StringField())
+
+        BlogPost.drop_collection()
+        BlogPost(title='Test', tags=['a', 'b']).save()
+
+        post = BlogPost.objects.lazy().first()
+        self.assertEqual(post._lazy_fields, set(['title', 'tags']))
+        self.assertEqual(post.tags, ['a', 'b'])
+        self.assertEqual(post._lazy_fields, set(['title']))
+
+        post = BlogPost.objects.lazy().lazy(False).first()
+        self.assertEqual(post._lazy_fields, frozenset())
+        self.assertEqual(post.title, 'Test')
+
+        BlogPost.drop_collection()
+
     def test_only(self):
         """Ensure that QuerySet.only only returns the requested fields.
         """
@@ -1929,6 +2106,88 @@ class QuerySetTest(unittest.TestCase):
         self.Person(name='ageless person').save()
         self.assertEqual(int(self.Person.objects.sum('age')), sum(ages))
 
+    def test_sum_and_average_db_fields(self):
+        """Ensure sum and average translate field names, including those of
+        embedded documents.
+        """
+        class Stats(EmbeddedDocument):
+            views = IntField(db_field='v')
+
+        class Page(Document):
+            size = IntField(db_field='s')
+            stats = EmbeddedDocumentField(Stats, db_field='st')
+
+        Page.drop_collection()
+        for size, views in [(1, 10), (2, 20), (6, 30)]:
+            Page(size=size, stats=Stats(views=views)).save()
+
+        self.assertEqual(Page.objects.sum('size'), 9)
+        self.assertEqual(Page.objects.average('size'), 3)
+        self.assertEqual(Page.objects.sum('stats.views'), 60)
+        self.assertEqual(Page.objects(size__gt=1).average('stats.views'), 25)
+        self.assertEqual(Page.objects(size__gt=10).sum('size'), 0)
+        self.assertEqual(Page.objects(size__gt=10).average('size'), 0)
+
+        Page.drop_collection()
+
+    def test_aggregation_functions_with_where(self):
+        """Ensure sum, average and item_frequencies honour where clauses.
+        """
+        self.Person.drop_collection()
+        for name, age in [('A', 10), ('B', 20), ('B', 30)]:
+            self.Person(name=name, age=age).save()
+
+        people = self.Person.objects.where('this[~age] > 15')
+        self.assertEqual(people.sum('age'), 50)
+        self.assertEqual(people.average('age'), 25)
+        self.assertEqual(people.item_frequencies('name', map_reduce=False),
+                         {'B': 2})
+
+        self.Person.drop_collection()
+
+    def test_aggregate(self):
+        """Ensure aggregate applies the queryset and translates field names.
+        """
+        class Stats(EmbeddedDocument):
+            views = IntField(db_field='v')
+
+        class Page(Document):
+            author = StringField(db_field='a')
+            size = IntField(db_field='s')
+            stats = EmbeddedDocumentField(Stats, db_field='st')
+
+        Page.drop_collection()
+        for i in xrange(10):
+            Page(author='author %d' % (i % 3), size=i,
+                 stats=Stats(views=i * 10)).save()
+
+        pages = Page.objects(size__gte=2).order_by('-size').limit(5)
+        results = list(pages.aggregate(
+            {'$match': {'$or': [{'author': 'author 0'},
+                                {'stats.views': {'$gt': 60}}]}},
+            {'$group': {'_id': '$author', 'views': {'$sum': '$stats.views'}}},
+            {'$sort': {'views': -1}}))
+        self.assertEqual(results, [{'_id': 'author 0', 'views': 150},
+                                   {'_id': 'author 2', 'views': 80},
+                                   {'_id': 'author 1', 'views': 70}])
+
+        # Names after a reshaping stage are left alone
+        results = list(Page.objects.aggregate([
+            {'$group': {'_id': None, 'size': {'$sum': '$size'}}},
+            {'$project': {'_id': 0, 'total': '$size'}}], batchSize=10))
+        self.assertEqual(results, [{'total': 45}])
+
+        # An empty limit selects no documents
+        results = list(Page.objects.limit(0).aggregate(
+            {'$group': {'_id': '$author'}}))
+        self.assertEqual(results, [])
+        self.assertEqual(list(Page.objects[:0].aggregate()), [])
+
+        self.assertRaises(InvalidQueryError,
+                          Page.objects.where('this.s > 1').aggregate)
+
+        Page.drop_collection()
+
     def test_distinct(self):
         """Ensure that the QuerySet.distinct method works.
         """
@@ -2497,6 +2756,166 @@ class QuerySetTest(unittest.TestCase):
 
         Number.drop_collection()
 
+    def test_chaining_returns_new_querysets(self):
+        """Ensure refining a queryset returns a new one sharing its query
+        state, and leaves the original unchanged.
+        """
+        base = self.Person.objects(age__gte=18)
+        base_query = base._query
+
+        adults = base.filter(Q(name='Alice') | Q(name='Bob'))
+        self.assertFalse(adults is base)
+        self.assertEqual(base._query, base_query)
+
+        names = adults.only('name').order_by('-age').limit(5).skip(1)
+        self.assertEqual(adults._limit, None)
+        self.assertEqual(adults._skip, None)
+        self.assertEqual(adults._ordering, [])
+        self.assertFalse(adults._loaded_fields)
+        self.assertEqual(names._limit, 5)
+        self.assertEqual(names._skip, 1)
+        self.assertEqual(names._ordering, [('age', pymongo.DESCENDING)])
+        self.assertEqual(names._loaded_fields.as_dict(),
+                         {'name': True, '_cls': True})
+
+        # Compiling the query does not change the shared query tree
+        self.assertTrue(names._query_obj is adults._query_obj)
+        names._query
+        self.assertFalse(any(isinstance(node, dict)
+                             for node in adults._query_obj.children))
+        self.assertEqual(adults._query, names._query)
+        self.assertEqual(base.clone()._query, base_query)
+
+    def test_cache(self):
+        """Ensure a cached queryset reads its results once.
+        """
+        self.Person.drop_collection()
+        for i in xrange(5):
+            self.Person(name='Person %d' % i, age=i).save()
+
+        people = self.Person.objects.order_by('age').cache()
+        with query_counter() as q:
+            self.assertEqual(people[1].age, 1)
+            self.assertTrue(people)
+            self.assertEqual([p.age for p in people], range(5))
+            self.assertEqual(len(people), 5)
+            self.assertEqual(people.count(), 5)
+            self.assertEqual(people[4].name, 'Person 4')
+            self.assertEqual(q, 1)
+
+        self.assertRaises(IndexError, people.__getitem__, 5)
+
+        # Refining the queryset does not use the cache
+        with query_counter() as q:
+            self.assertEqual(people.filter(age__gte=3).count(), 2)
+            self.assertEqual(q, 1)
+
+        empty = self.Person.objects(age=10).cache()
+        self.assertFalse(empty)
+        self.assertEqual(len(empty), 0)
+
+        self.Person.drop_collection()
+
+    def test_paginate_after(self):
+        """Ensure keyset pagination returns every document once, in order.
+        """
+        self.Person.drop_collection()
+        for i in xrange(10):
+            self.Person(name='Person %d' % i, age=i % 3).save()
+
+        people = self.Person.objects.order_by('-age')
+        expected = [p.name for p in people.order_by('-age', 'id')]
+
+        names, token, pages = [], None, 0
+        while True:
+            page, token = people.paginate_after(token, 4)
+            names += [p.name for p in page]
+            pages += 1
+            if token is None:
+                break
+        self.assertEqual(names, expected)
+        self.assertEqual(pages, 3)
+
+        # The last document of a page can be used instead of the token
+        page, token = people.only('name').paginate_after(None, 4)
+        next_page, _ = people.paginate_after(page[-1], 4)
+        self.assertEqual([p.name for p in next_page], expected[4:8])
+
+        # Filters on the ordering keys are kept
+        ids = [p.id for p in self.Person.objects.order_by('id')]
+        filtered = self.Person.objects(id__in=ids[::3])
+        page, token = filtered.paginate_after(None, 2)
+        next_page, token = filtered.paginate_after(token, 2)
+        self.assertEqual([p.id for p in page + next_page], ids[::3])
+        self.assertEqual(filtered.paginate_after(token, 2), ([], None))
+
+        self.assertRaises(InvalidQueryError,
+                          self.Person.objects.order_by('age').paginate_after,
+                          token)
+        self.assertRaises(InvalidQueryError, people.paginate_after, 'token')
+
+        self.Person.drop_collection()
+
+    def test_partitions(self):
+        """Ensure partitions split the query into disjoint ranges and that
+        a parallel scan returns every result once.
+        """
+        self.Person.drop_collection()
+        for i in xrange(100):
+            self.Person(name='Person %d' % i, age=i % 10).save()
+
+        people = self.Person.objects(age__lt=8)
+        expected = sorted(p.name for p in people)
+
+        partitions = people.partitions(4)
+        self.assertTrue(1 < len(partitions) <= 4)
+        names = sorted(p.name for queryset in partitions for p in queryset)
+        self.assertEqual(names, expected)
+
+        partitions = people.partitions(3, field='age')
+        names = sorted(p.name for queryset in partitions for p in queryset)
+        self.assertEqual(names, expected)
+
+        # Refining a partition keeps its range
+        counts = [queryset.count() for queryset in partitions]
+        self.assertEqual([queryset.filter(name__exists=True).count()
+                          for queryset in partitions], counts)
+        self.assertEqual([queryset.filter(age__gte=2).count()
+                          for queryset in partitions],
+                         [len([p for p in queryset if p.age >= 2])
+                          for queryset in partitions])
+
+        names = sorted(p.name for p in people.parallel_scan(workers=3))
+        self.assertEqual(names, expected)
+
+        self.assertRaises(InvalidQueryError, people.limit(10).partitions, 2)
+
+        self.Person.drop_collection()
+
+    def test_pickle_partitions(self):
+        """Ensure the querysets of partitions can be pickled, e.g. to send
+        them to a process pool.
+        """
+        import pickle
+
+        PickleFilm.drop_collection()
+        for year in xrange(1950, 2010):
+            PickleFilm(title='Film %d' % year, year=year).save()
+
+        films = PickleFilm.objects(year__lt=2000).order_by('year')
+        partitions = films.partitions(3, field='year')
+        list(partitions[0])
+        loaded = [pickle.loads(pickle.dumps(queryset))
+                  for queryset in partitions]
+        self.assertEqual([[f.title for f in queryset] for queryset in loaded],
+                         [[f.title for f in queryset]
+                          for queryset in partitions])
+        self.assertEqual(sum(queryset.count() for queryset in loaded), 50)
+        self.assertEqual(loaded[0].filter(year__gte=1951).count(),
+                         partitions[0].count() - 1)
+
+        PickleFilm.drop_collection()
+
     def test_unset_reference(self):
         class Comment(Document):
             text = StringField()
@@ -2852,6 +3271,78 @@ class QuerySetTest(unittest.TestCase):
         pks = self.Person.objects.order_by('age').scalar('pk')[1:3]
         self.assertEqual("[u'A1', u'A2']",  "%s" % sorted(self.Person.objects.scalar('name').in_bulk(list(pks)).values()))
 
+    def test_as_pymongo(self):
+        """Ensure that as_pymongo returns the raw dictionaries.
+        """
+        class Employee(self.Person):
+            salary = IntField(db_field='wage')
+
+        self.Person.drop_collection()
+        self.Person(name='User A', age=20).save()
+        employee = Employee(name='User B', age=30, salary=100)
+        employee.save()
+
+        results = list(self.Person.objects.order_by('age').as_pymongo())
+        self.assertEqual(len(results), 2)
+        self.assertTrue(isinstance(results[0], dict))
+        self.assertEqual(results[0]['name'], 'User A')
+        self.assertEqual(results[1]['wage'], 100)
+
+        results = list(Employee.objects.only('salary').as_pymongo())
+        self.assertEqual(results, [{'_id': employee.id,
+                                    '_cls': 'Person.Employee',
+                                    'wage': 100}])
+
+        result = self.Person.objects(age=30).as_pymongo(
+            translate_names=True).first()
+        self.assertEqual(result['salary'], 100)
+        self.assertFalse('wage' in result)
+
+        results = self.Person.objects.as_pymongo().in_bulk([employee.id])
+        self.assertEqual(results[employee.id]['name'], 'User B')
+
+        self.Person.drop_collection()
+
+    def test_to_columns(self):
+        """Ensure that to_columns and to_dataframe return typed columns.
+        """
+        import numpy
+
+        class Location(EmbeddedDocument):
+            city = StringField()
+
+        class Reading(Document):
+            value = FloatField()
+            count = IntField()
+            taken = DateTimeField()
+            location = EmbeddedDocumentField(Location)
+
+        Reading.drop_collection()
+        Reading(value=1.5, count=1, taken=datetime(2012, 1, 1),
+                location=Location(city='Leeds')).save()
+        Reading(value=2.5, count=2, taken=datetime(2012, 1, 2)).save()
+
+        columns = Reading.objects.order_by('count').to_columns(
+            'value', 'count', 'taken', 'location__city')
+        self.assertEqual(columns['value'].dtype, numpy.float64)
+        self.assertEqual(list(columns['value']), [1.5, 2.5])
+        self.assertEqual(columns['count'].dtype, numpy.int64)
+        self.assertEqual(columns['taken'].dtype,
+                         numpy.dtype('datetime64[ms]'))
+        self.assertEqual(columns['taken'][1],
+                         numpy.datetime64('2012-01-02T00:00:00.000'))
+        self.assertEqual(list(columns['location__city']), ['Leeds', None])
+
+        columns = Reading.objects(count=2).to_columns('count')
+        self.assertEqual(list(columns['count']), [2])
+
+        frame = Reading.objects.order_by('-count').to_dataframe(
+            'count', 'value')
+        self.assertEqual(list(frame.columns), ['count', 'value'])
+        self.assertEqual(list(frame['count']), [2, 1])
+
+        Reading.drop_collection()
+
 
 class QTest(unittest.TestCase):
 
@@ -3013,7 +3504,7 @@ class QTest(unittest.TestCase):
         self.assertEqual(test2.count(), 3)
         self.assertFalse(test2 == test)
 
-        test2.filter(x=6)
+        test2 = test2.filter(x=6)
         self.assertEqual(test2.count(), 1)
         self.assertEqual(test.count(), 3)
 
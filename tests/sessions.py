@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from mongoengine import *
+from mongoengine.connection import register_db
+
+
+class SessionTest(unittest.TestCase):
+
+    def setUp(self):
+        connect()
+        register_db('mongoenginetest')
+
+        class Person(Document):
+            name = StringField()
+            age = IntField(min_value=0)
+
+        class Post(Document):
+            title = StringField()
+            views = IntField(default=0)
+
+        Person.drop_collection()
+        Post.drop_collection()
+        self.Person = Person
+        self.Post = Post
+
+    def tearDown(self):
+        self.Person.drop_collection()
+        self.Post.drop_collection()
+
+    def test_writes_are_deferred(self):
+        """Ensure writes inside a session are only sent when it exits.
+        """
+        post = self.Post(title='Old')
+        post.save()
+        post.reload()
+
+        with session():
+            person = self.Person(name='Test User')
+            person.save()
+            post.title = 'New'
+            post.save()
+            post.update(inc__views=1)
+            self.assertEqual(person.pk, None)
+            self.assertEqual(self.Person.objects.count(), 0)
+            self.assertEqual(self.Post.objects.get().title, 'Old')
+
+        self.assertTrue(person.pk)
+        self.assertEqual(self.Person.objects.get().name, 'Test User')
+        post = self.Post.objects.get()
+        self.assertEqual(post.title, 'New')
+        self.assertEqual(post.views, 1)
+
+    def test_repeated_saves_merge(self):
+        """Ensure saving a document several times only writes it once.
+        """
+        person = self.Person(name='Test User')
+        person.save()
+        person.reload()
+
+        with session() as s:
+            person.name = 'User'
+            person.save()
+            person.age = 30
+            person.save()
+            self.assertEqual(len(filter(None, s._operations)), 1)
+
+        person = self.Person.objects.get()
+        self.assertEqual(person.name, 'User')
+        self.assertEqual(person.age, 30)
+
+        # The merged save is sent after the writes recorded before the last
+        post = self.Post(title='Post')
+        post.save()
+        post.reload()
+        with session():
+            post.views = 5
+            post.save()
+            post.update(set__views=10)
+            post.title = 'New Post'
+            post.save()
+        post = self.Post.objects.get()
+        self.assertEqual(post.title, 'New Post')
+        self.assertEqual(post.views, 5)
+
+    def test_delete(self):
+        """Ensure deletes are deferred and drop pending saves.
+        """
+        person = self.Person(name='Test User')
+        person.save()
+
+        with session():
+            person.name = 'User'
+            person.save()
+            person.delete()
+            new_person = self.Person(name='New User')
+            new_person.save()
+            new_person.delete()
+            self.assertEqual(self.Person.objects.count(), 1)
+
+        self.assertEqual(self.Person.objects.count(), 0)
+
+    def test_errors(self):
+        """Ensure nothing is written if the block raises and failed writes
+        are reported.
+        """
+        def raise_in_session():
+            with session():
+                self.Person(name='Test User').save()
+                raise ValueError
+
+        self.assertRaises(ValueError, raise_in_session)
+        self.assertEqual(self.Person.objects.count(), 0)
+
+        invalid = self.Person(name='Invalid', age=-1)
+        try:
+            with session(ordered=False):
+                self.Person(name='Test User').save()
+                invalid.save()
+            self.fail('BulkSaveError not raised')
+        except BulkSaveError, error:
+            self.assertEqual(error.errors.keys(), [1])
+            self.assertEqual(error.documents[1], invalid)
+        self.assertEqual(self.Person.objects.count(), 1)
+
+    def test_save_arguments(self):
+        """Ensure the arguments of saves inside a session are applied when
+        it is flushed.
+        """
+        class Blog(Document):
+            title = StringField()
+            author = ReferenceField(self.Person)
+
+        Blog.drop_collection()
+        author = self.Person(name='Test User')
+        author.save()
+        author.reload()
+        blog = Blog(title='Blog', author=author)
+        blog.save()
+
+        # Changed references are saved once the session's writes are sent
+        with session():
+            author.name = 'User'
+            blog.title = 'News'
+            blog.save()
+        self.assertEqual(self.Person.objects.get().name, 'User')
+        self.assertEqual(Blog.objects.get().title, 'News')
+
+        with session():
+            author.name = 'Other User'
+            blog.title = 'Other News'
+            blog.save(cascade=False)
+        self.assertEqual(self.Person.objects.get().name, 'User')
+        self.assertEqual(Blog.objects.get().title, 'Other News')
+
+        with session():
+            author.age = -1
+            author.save(validate=False)
+        self.assertEqual(self.Person.objects.get().age, -1)
+
+        def save_with_write_options():
+            with session():
+                blog.save(write_options={'w': 1})
+        self.assertRaises(OperationError, save_with_write_options)
+
+        Blog.drop_collection()
+
+    def test_databases(self):
+        """Ensure documents of the same collection name in different
+        databases are written to their own database.
+        """
+        register_db('mongoenginetest2', 'session-other')
+
+        class Note(Document):
+            text = StringField()
+            meta = {'collection': 'note'}
+
+        class OtherNote(Document):
+            text = StringField()
+            meta = {'collection': 'note', 'db_alias': 'session-other'}
+
+        Note.drop_collection()
+        OtherNote.drop_collection()
+
+        with session():
+            Note(text='Default').save()
+            OtherNote(text='Other').save()
+
+        self.assertEqual([n.text for n in Note.objects], ['Default'])
+        self.assertEqual([n.text for n in OtherNote.objects], ['Other'])
+
+        Note.drop_collection()
+        OtherNote.drop_collection()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -70,6 +70,23 @@ class SignalTests(unittest.TestCase):
                     signal_output.append('Is loaded')
                 else:
                     signal_output.append('Not loaded')
+
+            @classmethod
+            def pre_bulk_load(cls, sender, sons, **kwargs):
+                signal_output.append('pre_bulk_load signal, %s' %
+                                     [son['name'] for son in sons])
+
+            @classmethod
+            def post_bulk_load(cls, sender, documents, **kwargs):
+                signal_output.append('post_bulk_load signal, %s' % documents)
+
+            @classmethod
+            def pre_bulk_save(cls, sender, documents, **kwargs):
+                signal_output.append('pre_bulk_save signal, %s' % documents)
+
+            @classmethod
+            def post_bulk_save(cls, sender, documents, **kwargs):
+                signal_output.append('post_bulk_save signal, %s' % documents)
         self.Author = Author
 
 
@@ -121,6 +138,10 @@ class SignalTests(unittest.TestCase):
             len(signals.post_delete.receivers),
             len(signals.pre_bulk_insert.receivers),
             len(signals.post_bulk_insert.receivers),
+            len(signals.pre_bulk_load.receivers),
+            len(signals.post_bulk_load.receivers),
+            len(signals.pre_bulk_save.receivers),
+            len(signals.post_bulk_save.receivers),
         )
 
         signals.pre_init.connect(Author.pre_init, sender=Author)
@@ -131,6 +152,10 @@ class SignalTests(unittest.TestCase):
         signals.post_delete.connect(Author.post_delete, sender=Author)
         signals.pre_bulk_insert.connect(Author.pre_bulk_insert, sender=Author)
         signals.post_bulk_insert.connect(Author.post_bulk_insert, sender=Author)
+        signals.pre_bulk_load.connect(Author.pre_bulk_load, sender=Author)
+        signals.post_bulk_load.connect(Author.post_bulk_load, sender=Author)
+        signals.pre_bulk_save.connect(Author.pre_bulk_save, sender=Author)
+        signals.post_bulk_save.connect(Author.post_bulk_save, sender=Author)
 
         signals.pre_init.connect(Another.pre_init, sender=Another)
         signals.post_init.connect(Another.post_init, sender=Another)
@@ -148,6 +173,10 @@ class SignalTests(unittest.TestCase):
         signals.pre_save.disconnect(self.Author.pre_save)
         signals.pre_bulk_insert.disconnect(self.Author.pre_bulk_insert)
         signals.post_bulk_insert.disconnect(self.Author.post_bulk_insert)
+        signals.pre_bulk_load.disconnect(self.Author.pre_bulk_load)
+        signals.post_bulk_load.disconnect(self.Author.post_bulk_load)
+        signals.pre_bulk_save.disconnect(self.Author.pre_bulk_save)
+        signals.post_bulk_save.disconnect(self.Author.post_bulk_save)
 
         signals.pre_init.disconnect(self.Another.pre_init)
         signals.post_init.disconnect(self.Another.post_init)
@@ -166,6 +195,10 @@ class SignalTests(unittest.TestCase):
             len(signals.post_delete.receivers),
             len(signals.pre_bulk_insert.receivers),
             len(signals.post_bulk_insert.receivers),
+            len(signals.pre_bulk_load.receivers),
+            len(signals.post_bulk_load.receivers),
+            len(signals.pre_bulk_save.receivers),
+            len(signals.post_bulk_save.receivers),
         )
 
         self.assertEqual(self.pre_signals, post_signals)
@@ -230,3 +263,51 @@ class SignalTests(unittest.TestCase):
         ])
 
         self.Author.objects.delete()
+
+    def test_bulk_load_signals(self):
+        """ Loading in bulk sends a signal per batch instead of per document. """
+        self.Author.objects.delete()
+        self.Author.objects.insert([self.Author(name='Bill Shakespeare'),
+                                    self.Author(name='Christopher Marlowe'),
+                                    self.Author(name='Ben Jonson')],
+                                   load_bulk=False)
+
+        def load_authors():
+            list(self.Author.objects.order_by('name').bulk_load(2))
+
+        self.assertEqual(self.get_signal_output(load_authors), [
+            "pre_bulk_load signal, [u'Ben Jonson', u'Bill Shakespeare']",
+            "post_bulk_load signal, [<Author: Ben Jonson>, "
+            "<Author: Bill Shakespeare>]",
+            "pre_bulk_load signal, [u'Christopher Marlowe']",
+            "post_bulk_load signal, [<Author: Christopher Marlowe>]",
+        ])
+
+        def load_author():
+            self.Author.objects(name='Ben Jonson').first()
+
+        # Without bulk loading the init signals are still sent
+        signal_output = self.get_signal_output(load_author)
+        self.assertEqual(signal_output[0], "pre_init signal, Author")
+        self.assertEqual(signal_output[-1], "post_init signal, Ben Jonson")
+
+        self.Author.objects.delete()
+
+    def test_bulk_save_signals(self):
+        """ Saving in bulk sends a signal for all the documents. """
+        self.Author.objects.delete()
+        authors = [self.Author(name='Bill Shakespeare'),
+                   self.Author(name='Ben Jonson')]
+
+        def save_authors():
+            self.Author.objects.bulk_save(authors)
+
+        self.assertEqual(self.get_signal_output(save_authors), [
+            "pre_bulk_save signal, [<Author: Bill Shakespeare>, "
+            "<Author: Ben Jonson>]",
+            "post_bulk_save signal, [<Author: Bill Shakespeare>, "
+            "<Author: Ben Jonson>]",
+        ])
+        self.assertEqual(self.Author.objects.count(), 2)
+
+        self.Author.objects.delete()